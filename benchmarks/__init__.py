@@ -0,0 +1,10 @@
+"""
+Benchmarks for the fixture allocation: a synthetic data generator
+(datagen), timing and peak-memory scenarios (run) and an equivalence
+harness comparing engines and modes with the reference (equivalence) and
+the app's cold-start time (startup).
+
+    python -m benchmarks.run --scenario 100k
+    python -m benchmarks.equivalence --rows 20000 --seeds 5
+    python -m benchmarks.startup
+"""
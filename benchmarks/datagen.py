@@ -0,0 +1,62 @@
+"""
+Synthetic allocation inputs with the DEFAULT_COL_MAP column names.
+"""
+import numpy as np
+import pandas as pd
+
+from ficture_processing import DEFAULT_COL_MAP
+
+# CONT% distributions: each takes a generator and a size and returns values.
+CONT_DISTRIBUTIONS = {
+    # Mostly small shares with a long tail, like real contribution data.
+    'lognormal': lambda rng, n: np.round(rng.lognormal(-1.5, 1.0, n), 2),
+    'uniform': lambda rng, n: np.round(rng.uniform(0, 1.5, n), 2),
+    # Few distinct values, so many ties in the CONT% sort.
+    'coarse': lambda rng, n: rng.choice([0.1, 0.25, 0.5, 0.75, 1.0], n),
+}
+
+# MC FIX distributions, constant within a (store, department, UDF) group.
+MC_DISTRIBUTIONS = {
+    'poisson': lambda rng, n: rng.poisson(3, n).astype(np.float64),
+    'small': lambda rng, n: rng.choice([0, 1, 2, 2.5, 3, 5, 8], n).astype(np.float64),
+    'large': lambda rng, n: rng.integers(10, 200, n).astype(np.float64),
+}
+
+def generate(rows, stores=500, departments=4, udfs=6, articles_per_group=40,
+             cont='lognormal', mc='poisson', missing=0.0, extra_columns=1, seed=0):
+    """
+    Returns a synthetic input DataFrame.
+
+    Args:
+        rows (int): Number of rows.
+        stores, departments, udfs (int): Distinct values of each key.
+        articles_per_group (int): Distinct articles per (store, department,
+            UDF) group; rows beyond that repeat articles within a group.
+        cont (str): One of CONT_DISTRIBUTIONS.
+        mc (str): One of MC_DISTRIBUTIONS.
+        missing (float): Share of missing values in STORE, ART, CONT% and MC FIX.
+        extra_columns (int): Unmapped float columns carried through.
+        seed (int): Random seed; the same arguments give the same frame.
+    """
+    rng = np.random.default_rng(seed)
+    store = rng.integers(0, stores, rows)
+    department = rng.integers(0, departments, rows)
+    udf = rng.integers(0, udfs, rows)
+    group = (store * departments + department) * udfs + udf
+    mc_by_group = MC_DISTRIBUTIONS[mc](rng, stores * departments * udfs)
+
+    df = pd.DataFrame({
+        DEFAULT_COL_MAP['store']: pd.Series(store).map('S{:05d}'.format),
+        DEFAULT_COL_MAP['department']: pd.Series(department).map('D{:02d}'.format),
+        DEFAULT_COL_MAP['udf']: pd.Series(udf).map('U{:02d}'.format),
+        DEFAULT_COL_MAP['mc_fic']: mc_by_group[group],
+        DEFAULT_COL_MAP['cont_per']: CONT_DISTRIBUTIONS[cont](rng, rows),
+        DEFAULT_COL_MAP['art']: pd.Series(rng.integers(0, articles_per_group, rows)).map('A{:04d}'.format),
+    })
+    for i in range(extra_columns):
+        df[f"EXTRA_{i}"] = rng.random(rows)
+
+    if missing:
+        for key in ('store', 'art', 'cont_per', 'mc_fic'):
+            df.loc[rng.random(rows) < missing, DEFAULT_COL_MAP[key]] = None
+    return df
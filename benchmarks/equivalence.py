@@ -0,0 +1,121 @@
+"""
+Checks that the faster engines and modes produce the same allocation as
+the reference implementation.
+
+    python -m benchmarks.equivalence --rows 20000 --seeds 5
+"""
+import argparse
+import os
+import sys
+import tempfile
+
+import pandas as pd
+
+from benchmarks.datagen import generate
+from ficture_processing import DEFAULT_COL_MAP, PASSES, allocate, allocate_incremental
+from ficture_stream import allocate_stream
+
+# Columns that must match exactly.
+RESULT_COLUMNS = [f"Allocate_{i}" for i in range(PASSES)] + ['Final']
+
+def _stream(df, col_map):
+    with tempfile.TemporaryDirectory() as tmp:
+        source = os.path.join(tmp, 'input.parquet')
+        target = os.path.join(tmp, 'output.parquet')
+        df.to_parquet(source, index=False)
+        # A tiny ceiling forces many chunks and partitions.
+        allocate_stream(source, target, col_map, memory_mb=1)
+        return pd.read_parquet(target).set_axis(df.index)
+
+def _stream_csv(df, col_map):
+    # Number codes for the stores and articles with text ones in the last
+    # rows, so the key columns of the first chunks read as numbers and of the
+    # last as text. The file is not the frame, so the expected result is the
+    # reference on a full read of it.
+    coded = df.copy()
+    for key in ('store', 'art'):
+        codes, _ = pd.factorize(coded[col_map[key]])
+        coded[col_map[key]] = pd.array(codes + 1001, dtype='Int64').astype(object)
+        coded.loc[codes < 0, col_map[key]] = None
+        coded.iloc[-max(1, len(df) // 100):, coded.columns.get_loc(col_map[key])] = f"{key[0].upper()}-77"
+    with tempfile.TemporaryDirectory() as tmp:
+        source = os.path.join(tmp, 'input.csv')
+        # Parquet output takes the first chunk's types, so write CSV.
+        target = os.path.join(tmp, 'output.csv')
+        coded.to_csv(source, index=False)
+        allocate_stream(source, target, col_map, memory_mb=1)
+        expected = allocate(pd.read_csv(source), col_map, engine="reference")
+        return expected, pd.read_csv(target).set_axis(expected.index)
+
+def _incremental(df, col_map):
+    # Reallocate after changing one row, so reused groups are exercised too.
+    changed = df.copy()
+    changed.iloc[0, changed.columns.get_loc(col_map['cont_per'])] += 1
+    _, state, _ = allocate_incremental(changed, col_map)
+    return allocate_incremental(df, col_map, previous=state)[0]
+
+# Engines and modes compared with the reference: name -> function(df, col_map),
+# returning the result, or the expected result and the result when the
+# candidate allocates other data than `df`.
+CANDIDATES = {
+    'numpy': lambda df, col_map: allocate(df, col_map),
+    'numpy-compact': lambda df, col_map: allocate(df, col_map, compact=True),
+    'numpy-parallel': lambda df, col_map: allocate(df, col_map, workers=2),
+    'incremental': _incremental,
+    'stream': _stream,
+    'stream-csv': _stream_csv,
+}
+
+def compare(expected, actual):
+    """
+    Returns the result columns in which `actual` differs from `expected`,
+    with the number of differing rows.
+    """
+    differences = {}
+    for col in RESULT_COLUMNS:
+        left = expected[col].to_numpy(dtype='float64')
+        right = actual[col].to_numpy(dtype='float64')
+        if len(left) != len(right):
+            differences[col] = max(len(left), len(right))
+        elif (left != right).any():
+            differences[col] = int((left != right).sum())
+    return differences
+
+def check(df, col_map=DEFAULT_COL_MAP, candidates=None):
+    """
+    Allocates `df` with the reference engine and every candidate.
+
+    Returns:
+        dict: Candidate name -> differences (see compare); empty when all match.
+    """
+    expected = allocate(df, col_map, engine="reference")
+    failures = {}
+    for name in candidates or CANDIDATES:
+        result = CANDIDATES[name](df, col_map)
+        differences = compare(*result) if isinstance(result, tuple) else compare(expected, result)
+        if differences:
+            failures[name] = differences
+    return failures
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m benchmarks.equivalence", description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--rows", type=int, default=20_000)
+    parser.add_argument("--seeds", type=int, default=3, help="Number of random datasets per distribution.")
+    parser.add_argument("--candidates", nargs="+", choices=list(CANDIDATES), help="Defaults to all.")
+    args = parser.parse_args(argv)
+
+    failed = False
+    for seed in range(args.seeds):
+        for cont, mc, missing in [('lognormal', 'poisson', 0.0), ('coarse', 'small', 0.03), ('uniform', 'large', 0.01)]:
+            df = generate(args.rows, stores=max(1, args.rows // 200), cont=cont, mc=mc, missing=missing, seed=seed)
+            failures = check(df, candidates=args.candidates)
+            label = f"seed={seed} cont={cont} mc={mc} missing={missing}"
+            if failures:
+                failed = True
+                print(f"{label}: MISMATCH {failures}", flush=True)
+            else:
+                print(f"{label}: ok", flush=True)
+    return 1 if failed else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,130 @@
+"""
+Times the allocation engines and modes on synthetic scenarios and reports
+wall time and peak traced memory.
+
+    python -m benchmarks.run --scenario 10k 100k --modes numpy incremental
+    python -m benchmarks.run --scenario 1m --json results.json
+
+Peak memory is measured with tracemalloc in this process, so it leaves out
+the worker processes of the parallel mode.
+"""
+import argparse
+import gc
+import json
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+
+from benchmarks.datagen import generate
+from ficture_processing import DEFAULT_COL_MAP, allocate, allocate_incremental
+from ficture_stream import allocate_stream
+
+# Scenario name -> generate() arguments.
+SCENARIOS = {
+    '10k': dict(rows=10_000, stores=50),
+    '100k': dict(rows=100_000, stores=500),
+    '1m': dict(rows=1_000_000, stores=3_000),
+    '5m': dict(rows=5_000_000, stores=10_000),
+    # Few large groups with many CONT% ties.
+    '1m-wide': dict(rows=1_000_000, stores=100, articles_per_group=2_000, cont='coarse'),
+}
+
+# The reference engine is only timed up to this many rows.
+REFERENCE_MAX_ROWS = 100_000
+
+def _numpy(df, col_map):
+    allocate(df, col_map)
+
+def _parallel(df, col_map):
+    allocate(df, col_map, workers=os.cpu_count() or 1)
+
+def _reference(df, col_map):
+    allocate(df, col_map, engine="reference")
+
+def _incremental(df, col_map):
+    # Only the rerun after editing one row is measured.
+    _, state, _ = allocate_incremental(df, col_map)
+    changed = df.copy()
+    changed.iloc[0, changed.columns.get_loc(col_map['cont_per'])] += 1
+    tracemalloc.reset_peak()
+    start = time.perf_counter()
+    allocate_incremental(changed, col_map, previous=state)
+    return time.perf_counter() - start
+
+def _stream(df, col_map):
+    with tempfile.TemporaryDirectory() as tmp:
+        source = os.path.join(tmp, 'input.parquet')
+        df.to_parquet(source, index=False)
+        tracemalloc.reset_peak()
+        start = time.perf_counter()
+        allocate_stream(source, os.path.join(tmp, 'output.parquet'), col_map, memory_mb=256)
+        return time.perf_counter() - start
+
+# Mode name -> function(df, col_map). A function that returns a number
+# reports that as its time, for modes with untimed setup.
+MODES = {
+    'numpy': _numpy,
+    'parallel': _parallel,
+    'incremental': _incremental,
+    'stream': _stream,
+    'reference': _reference,
+}
+
+def _measure(mode, df, col_map, trace):
+    gc.collect()
+    if trace:
+        tracemalloc.start()
+    start = time.perf_counter()
+    try:
+        seconds = MODES[mode](df, col_map)
+        if seconds is None:
+            seconds = time.perf_counter() - start
+        peak = tracemalloc.get_traced_memory()[1] if trace else None
+    finally:
+        if trace:
+            tracemalloc.stop()
+    return seconds, peak
+
+def run_mode(mode, df, col_map=DEFAULT_COL_MAP, memory=True):
+    """
+    Runs one mode on `df`. Tracing slows the allocation down severalfold,
+    so the peak memory comes from a second, traced run.
+
+    Returns:
+        dict: 'seconds' of wall time and 'peak_mb' of traced memory (None
+        without `memory`).
+    """
+    seconds, _ = _measure(mode, df, col_map, trace=False)
+    peak_mb = _measure(mode, df, col_map, trace=True)[1] / 1e6 if memory else None
+    return {'seconds': seconds, 'peak_mb': peak_mb}
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m benchmarks.run", description="Fixture allocation benchmarks.")
+    parser.add_argument("--scenario", nargs="+", choices=list(SCENARIOS), default=['10k', '100k'])
+    parser.add_argument("--modes", nargs="+", choices=list(MODES), default=['numpy', 'parallel', 'incremental', 'stream', 'reference'])
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--no-memory", action="store_true", help="Skip the traced run that measures peak memory.")
+    parser.add_argument("--json", help="Also write the results to this file.")
+    args = parser.parse_args(argv)
+
+    results = []
+    print(f"{'scenario':<10} {'mode':<12} {'rows':>10} {'seconds':>9} {'peak MB':>9}", flush=True)
+    for scenario in args.scenario:
+        df = generate(seed=args.seed, **SCENARIOS[scenario])
+        for mode in args.modes:
+            if mode == 'reference' and len(df) > REFERENCE_MAX_ROWS:
+                continue
+            result = {'scenario': scenario, 'mode': mode, 'rows': len(df), **run_mode(mode, df, memory=not args.no_memory)}
+            results.append(result)
+            peak = '-' if result['peak_mb'] is None else f"{result['peak_mb']:.1f}"
+            print(f"{scenario:<10} {mode:<12} {len(df):>10,} {result['seconds']:>9.2f} {peak:>9}", flush=True)
+
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump(results, f, indent=2)
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,75 @@
+"""
+Times the app's cold start: the first run of file_input.py, up to the
+rendered upload page, in a fresh Python process each time. The Streamlit
+import itself is left out, as it is the same for any app.
+
+    python -m benchmarks.startup
+    python -m benchmarks.startup --repeats 10 --json startup.json
+
+Exits with status 1 when the median is over --target seconds, or when the
+upload page loaded a module listed in DEFERRED_MODULES.
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+# Median seconds allowed for the first run of the upload page.
+STARTUP_TARGET_SECONDS = 0.25
+
+# Modules the upload page must not import; they load once a file is uploaded.
+DEFERRED_MODULES = ('pandas', 'altair', 'numba', 'ficture_processing', 'ficture_io', 'ficture_cache')
+
+# Run in each fresh process; prints the first-run seconds and the deferred
+# modules that were loaded anyway.
+_PROBE = """
+import json, sys, time
+from streamlit.testing.v1 import AppTest
+start = time.perf_counter()
+app = AppTest.from_file('file_input.py', default_timeout=60).run()
+seconds = time.perf_counter() - start
+if app.exception:
+    raise SystemExit(app.exception[0].message)
+print(json.dumps({'seconds': seconds, 'loaded': [name for name in %r if name in sys.modules]}))
+"""
+
+APP_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+def measure_startup():
+    """
+    Runs the upload page once in a fresh interpreter.
+
+    Returns:
+        dict: 'seconds' of the first run and 'loaded', the DEFERRED_MODULES
+        it imported.
+    """
+    completed = subprocess.run(
+        [sys.executable, '-c', _PROBE % (DEFERRED_MODULES,)],
+        cwd=APP_DIR, capture_output=True, text=True, check=True
+    )
+    return json.loads(completed.stdout.strip().splitlines()[-1])
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m benchmarks.startup", description="App cold-start benchmark.")
+    parser.add_argument("--repeats", type=int, default=5, help="Fresh processes to time; the median is reported.")
+    parser.add_argument("--target", type=float, default=STARTUP_TARGET_SECONDS, help="Median seconds allowed.")
+    parser.add_argument("--json", help="Also write the results to this file.")
+    args = parser.parse_args(argv)
+
+    runs = [measure_startup() for _ in range(args.repeats)]
+    median = statistics.median(run['seconds'] for run in runs)
+    loaded = sorted({name for run in runs for name in run['loaded']})
+    print(f"first run: median {median:.3f}s, min {min(run['seconds'] for run in runs):.3f}s over {len(runs)} processes "
+          f"(target {args.target:.2f}s)")
+    if loaded:
+        print(f"loaded before an upload: {', '.join(loaded)}")
+
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump({'target': args.target, 'median': median, 'loaded': loaded, 'runs': runs}, f, indent=2)
+    return 0 if median <= args.target and not loaded else 1
+
+if __name__ == "__main__":
+    sys.exit(main())
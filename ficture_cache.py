@@ -0,0 +1,304 @@
+import hashlib
+import json
+import os
+import tempfile
+import uuid
+
+import pandas as pd
+
+from ficture_io import EXPORT_SUFFIXES
+from ficture_processing import ALLOCATION_VERSION
+
+# Where cached results live and how much disk they may use; both can be
+# overridden through the environment.
+CACHE_DIR = os.environ.get(
+    'FICTURE_CACHE_DIR',
+    os.path.join(os.path.expanduser('~'), '.cache', 'ficture_allocation')
+)
+CACHE_MAX_BYTES = int(os.environ.get('FICTURE_CACHE_MB', '2048')) * 1024 * 1024
+
+# Where uploads are stored after their first parse, and the disk they may use.
+INGEST_DIR = os.environ.get(
+    'FICTURE_INGEST_DIR',
+    os.path.join(os.path.expanduser('~'), '.cache', 'ficture_ingest')
+)
+INGEST_MAX_BYTES = int(os.environ.get('FICTURE_INGEST_MB', '4096')) * 1024 * 1024
+
+# Where the app writes result exports for download, and the disk they may use.
+EXPORT_DIR = os.environ.get(
+    'FICTURE_EXPORT_DIR',
+    os.path.join(os.path.expanduser('~'), '.cache', 'ficture_exports')
+)
+EXPORT_MAX_BYTES = int(os.environ.get('FICTURE_EXPORT_MB', '2048')) * 1024 * 1024
+
+# Where running allocations keep their checkpoints (see Checkpoint), and the
+# disk they may use.
+CHECKPOINT_DIR = os.environ.get(
+    'FICTURE_CHECKPOINT_DIR',
+    os.path.join(os.path.expanduser('~'), '.cache', 'ficture_checkpoints')
+)
+CHECKPOINT_MAX_BYTES = int(os.environ.get('FICTURE_CHECKPOINT_MB', '1024')) * 1024 * 1024
+
+def content_hash(file):
+    """Returns a hash of the bytes of a path, uploaded file or buffer."""
+    h = hashlib.sha256()
+    if isinstance(file, (str, os.PathLike)):
+        with open(file, 'rb') as f:
+            for block in iter(lambda: f.read(1 << 20), b''):
+                h.update(block)
+    else:
+        h.update(file.getbuffer())
+    return h.hexdigest()
+
+def _evict(directory, suffix, max_bytes):
+    """
+    Removes the least recently used files whose names end with `suffix` (a
+    string or a tuple of them) until `directory` fits in max_bytes. Files that cannot be removed, e.g. on Windows while another
+    session still has them memory-mapped, are skipped.
+    """
+    entries = []
+    for entry in os.scandir(directory):
+        if entry.name.endswith(suffix):
+            try:
+                stat = entry.stat()
+            except FileNotFoundError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, entry.path))
+
+    total = sum(size for _, size, _ in entries)
+    for _, size, path in sorted(entries):
+        if total <= max_bytes:
+            break
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+        except OSError:
+            continue
+        total -= size
+
+def evict_checkpoints(directory=CHECKPOINT_DIR, max_bytes=CHECKPOINT_MAX_BYTES):
+    """
+    Removes the least recently written checkpoints until `directory` fits in
+    max_bytes. Runs that are never repeated leave theirs behind.
+    """
+    _evict(directory, '.npz', max_bytes)
+
+def _write_atomic(directory, path, write):
+    """Calls write(file) on a temporary file in `directory`, then renames it to `path`."""
+    fd, tmp_path = tempfile.mkstemp(dir=directory, suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            write(f)
+        os.replace(tmp_path, path)
+    except BaseException:
+        os.remove(tmp_path)
+        raise
+
+def data_hash(df):
+    """
+    Returns a content hash of a DataFrame: column names, dtypes and values,
+    ignoring the index.
+    """
+    h = hashlib.sha256()
+    h.update(json.dumps([[str(col), str(dtype)] for col, dtype in df.dtypes.items()]).encode('utf-8'))
+    h.update(pd.util.hash_pandas_object(df, index=False).to_numpy().tobytes())
+    return h.hexdigest()
+
+class ResultCache:
+    """
+    Allocation results stored on local disk as Parquet files, keyed by the
+    input data, the column mapping and ALLOCATION_VERSION, and evicted least
+    recently used first once the directory grows past `max_bytes`.
+
+    Several processes can share one directory: files are written to a
+    temporary name and renamed into place.
+    """
+
+    def __init__(self, directory=CACHE_DIR, max_bytes=CACHE_MAX_BYTES):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        os.makedirs(directory, exist_ok=True)
+
+    def key(self, df, col_map, **options):
+        """
+        Returns the cache key for allocating `df` with `col_map` and any
+        other options that change the result.
+        """
+        h = hashlib.sha256()
+        h.update(data_hash(df).encode('utf-8'))
+        h.update(json.dumps(
+            {'col_map': col_map, 'version': ALLOCATION_VERSION, 'options': options},
+            sort_keys=True
+        ).encode('utf-8'))
+        return h.hexdigest()
+
+    def _path(self, key):
+        return os.path.join(self.directory, f"{key}.parquet")
+
+    def __contains__(self, key):
+        return os.path.exists(self._path(key))
+
+    def get(self, key):
+        """Returns the cached result for `key`, or None."""
+        path = self._path(key)
+        try:
+            df = pd.read_parquet(path)
+        except FileNotFoundError:
+            return None
+        # The modification time records the last use for LRU eviction.
+        try:
+            os.utime(path)
+        except FileNotFoundError:
+            pass
+        return df
+
+    def put(self, key, df):
+        """
+        Stores a result under `key`, then evicts old entries if needed.
+
+        Caching is best-effort: a result Arrow cannot convert (e.g. a column
+        holding both numbers and text) or a failed write is not cached.
+
+        Returns:
+            bool: Whether the result was stored.
+        """
+        import pyarrow as pa
+
+        try:
+            _write_atomic(self.directory, self._path(key), lambda f: df.to_parquet(f, compression='zstd'))
+        except (pa.ArrowException, OSError):
+            return False
+        try:
+            self.evict()
+        except OSError:
+            pass
+        return True
+
+    def evict(self):
+        """Removes least recently used entries until the cache fits in max_bytes."""
+        _evict(self.directory, '.parquet', self.max_bytes)
+
+class IngestStore:
+    """
+    Parsed uploads stored on local disk as uncompressed Arrow IPC (Feather)
+    files keyed by the file's content and read options, and opened
+    memory-mapped: numeric columns are then views of the file rather than
+    copies in memory. Least recently used files are evicted once the
+    directory grows past `max_bytes`.
+    """
+
+    def __init__(self, directory=INGEST_DIR, max_bytes=INGEST_MAX_BYTES):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        os.makedirs(directory, exist_ok=True)
+
+    def key(self, file_hash, **options):
+        """
+        Returns the store key for a file with content hash `file_hash` (see
+        content_hash) read with `options` (name, sheet, columns...).
+        """
+        h = hashlib.sha256()
+        h.update(file_hash.encode('utf-8'))
+        h.update(json.dumps(options, sort_keys=True, default=str).encode('utf-8'))
+        return h.hexdigest()
+
+    def _path(self, key):
+        return os.path.join(self.directory, f"{key}.arrow")
+
+    def __contains__(self, key):
+        return os.path.exists(self._path(key))
+
+    def put(self, key, df):
+        """
+        Stores a parsed DataFrame under `key`, then evicts old entries if
+        needed. Frames Arrow cannot convert (e.g. a column holding both
+        numbers and text, common in Excel files) and failed writes are not
+        stored.
+
+        Returns:
+            bool: Whether the DataFrame was stored.
+        """
+        import pyarrow as pa
+
+        try:
+            _write_atomic(
+                self.directory, self._path(key),
+                lambda f: df.reset_index(drop=True).to_feather(f, compression='uncompressed')
+            )
+        except (pa.ArrowException, OSError):
+            return False
+        try:
+            self.evict()
+        except OSError:
+            pass
+        return True
+
+    def open(self, key):
+        """Returns the DataFrame stored under `key`, memory-mapped, or None."""
+        import pyarrow as pa
+        import pyarrow.ipc as ipc
+
+        path = self._path(key)
+        try:
+            source = pa.memory_map(path)
+        except FileNotFoundError:
+            return None
+        # The modification time records the last use for LRU eviction; the
+        # mapping stays readable if the file is evicted meanwhile.
+        try:
+            os.utime(path)
+        except FileNotFoundError:
+            pass
+        # split_blocks keeps columns apart, so those without nulls stay
+        # zero-copy views of the mapped file.
+        return ipc.open_file(source).read_all().to_pandas(split_blocks=True)
+
+    def evict(self):
+        """Removes least recently used entries until the store fits in max_bytes."""
+        _evict(self.directory, '.arrow', self.max_bytes)
+
+class ExportStore:
+    """
+    Exported results offered for download, kept in one directory shared by
+    every session and evicted least recently used first once it grows past
+    `max_bytes`, so exports of sessions that have ended do not pile up.
+    """
+
+    def __init__(self, directory=EXPORT_DIR, max_bytes=EXPORT_MAX_BYTES):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        os.makedirs(directory, exist_ok=True)
+
+    def new_path(self, fmt):
+        """Returns an unused path for an export in `fmt`."""
+        return os.path.join(self.directory, f"{uuid.uuid4().hex}.{fmt}")
+
+    def read(self, path):
+        """Returns the bytes of an export, or None once it was evicted."""
+        try:
+            with open(path, 'rb') as f:
+                data = f.read()
+        except FileNotFoundError:
+            return None
+        # The modification time records the last use for LRU eviction.
+        try:
+            os.utime(path)
+        except FileNotFoundError:
+            pass
+        return data
+
+    def remove(self, path):
+        """Removes an export that is no longer offered."""
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+
+    def evict(self):
+        """
+        Removes least recently used exports until the store fits in
+        max_bytes. Exports still being written have temporary names and are
+        left alone.
+        """
+        _evict(self.directory, EXPORT_SUFFIXES, self.max_bytes)
@@ -0,0 +1,295 @@
+"""
+Command-line entry point for unattended allocation runs.
+
+Example:
+    python -m ficture_cli run "data/*.xlsx" --out-dir results --format parquet --col-map map.json --jobs 4
+    python -m ficture_cli sweep data/stores.xlsx --min-requirement 0.3 0.4 0.5 --out sweep.csv
+"""
+import argparse
+import concurrent.futures
+import glob
+import json
+import multiprocessing
+import os
+import sys
+import time
+
+from ficture_io import OUTPUT_FORMATS, file_format, input_size, mapped_columns, read_table, write_table
+from ficture_processing import (
+    DEFAULT_COL_MAP, DEFAULT_RULES, ENGINES, Checkpoint, Profile, allocate, allocate_sweep, rule_grid
+)
+from ficture_stream import MEMORY_MB, STREAM_OUTPUT_FORMATS, allocate_stream
+from ficture_validate import ValidationError, format_problem, validate
+
+def load_col_map(path):
+    """
+    Reads a column mapping from a JSON file. Keys that are not given keep
+    their DEFAULT_COL_MAP value.
+    """
+    col_map = dict(DEFAULT_COL_MAP)
+    if path:
+        with open(path, encoding='utf-8') as f:
+            overrides = json.load(f)
+        unknown = set(overrides) - set(DEFAULT_COL_MAP)
+        if unknown:
+            raise ValueError(f"Unknown column map keys: {sorted(unknown)}. Expected {sorted(DEFAULT_COL_MAP)}.")
+        col_map.update(overrides)
+    return col_map
+
+def expand_inputs(patterns):
+    """
+    Expands file names and glob patterns into a sorted list of unique paths.
+
+    Raises:
+        FileNotFoundError: If a pattern matches nothing.
+    """
+    paths = []
+    for pattern in patterns:
+        matches = sorted(glob.glob(pattern)) if glob.has_magic(pattern) else [pattern]
+        matches = [path for path in matches if os.path.isfile(path)]
+        if not matches:
+            raise FileNotFoundError(f"No input files match: {pattern}")
+        paths.extend(matches)
+    return list(dict.fromkeys(paths))
+
+def output_path(input_path, out_dir, fmt):
+    """Returns the output file for `input_path` inside `out_dir`."""
+    stem = os.path.splitext(os.path.basename(input_path))[0]
+    return os.path.join(out_dir, f"{stem}_allocated.{fmt}")
+
+def run_file(input_path, out_path, col_map, engine="numpy", workers=1, compact=False,
+             sheet=None, mapped_only=False, stream=False, memory_mb=MEMORY_MB, profiled=False,
+             checkpoint_dir=None, checkpoint_groups=None):
+    """
+    Loads, allocates and writes one file. With mapped_only, only the mapped
+    columns are read (and written). With stream, the file is processed in
+    chunks within `memory_mb` (see ficture_stream); engine and workers are
+    then not used. With profiled, the report carries the allocation's
+    Profile as a dict under 'profile'. With checkpoint_dir, the allocation
+    saves its progress there (every `checkpoint_groups` groups and after
+    each pass) and an interrupted run of the same file resumes from it.
+
+    Loaded inputs are validated first (see ficture_validate); the report
+    lists the warnings under 'warnings'.
+
+    Returns:
+        dict: Row count, input file size in bytes and the load/allocate/write
+        timings in seconds (only the total when streaming).
+
+    Raises:
+        ValidationError: If the input cannot be allocated, e.g. text in CONT%.
+    """
+    start = time.perf_counter()
+    if stream:
+        stats = allocate_stream(
+            input_path, out_path, col_map, memory_mb=memory_mb, sheet=sheet,
+            compact=compact, mapped_only=mapped_only
+        )
+        return {
+            'input': input_path,
+            'output': out_path,
+            'rows': stats['rows'],
+            'bytes': input_size(input_path),
+            'total': time.perf_counter() - start,
+        }
+
+    df = read_table(
+        input_path,
+        columns=mapped_columns(col_map) if mapped_only else None,
+        sheet=sheet
+    )
+    df, problems = validate(df, col_map)
+    if any(problem['severity'] == 'error' for problem in problems):
+        raise ValidationError(problems)
+    loaded = time.perf_counter()
+
+    profile = Profile() if profiled else None
+    checkpoint = None
+    if checkpoint_dir:
+        stem = os.path.splitext(os.path.basename(out_path))[0]
+        checkpoint = Checkpoint(os.path.join(checkpoint_dir, f"{stem}.checkpoint.npz"), checkpoint_groups)
+    result_df = allocate(
+        df, col_map, engine=engine, workers=workers, compact=compact, profile=profile, checkpoint=checkpoint
+    )
+    allocated = time.perf_counter()
+
+    write_table(result_df, out_path)
+    written = time.perf_counter()
+
+    return {
+        'input': input_path,
+        'output': out_path,
+        'rows': len(df),
+        'bytes': input_size(input_path),
+        'load': loaded - start,
+        'allocate': allocated - loaded,
+        'write': written - allocated,
+        'total': written - start,
+        'profile': profile.to_dict() if profile is not None else None,
+        'resumed_from': checkpoint.resumed_from if checkpoint is not None else None,
+        'warnings': [format_problem(problem) for problem in problems],
+    }
+
+def format_report(report):
+    """Formats one run_file report as a single line."""
+    if 'load' not in report:
+        return (
+            f"{report['input']}: {report['rows']:,} rows ({report['bytes'] / 1e6:.1f} MB) "
+            f"streamed in {report['total']:.1f}s -> {report['output']}"
+        )
+    resumed = ""
+    if report.get('resumed_from') is not None:
+        pass_no, group = report['resumed_from']
+        resumed = f"resumed at pass {pass_no + 1}, group {group:,}; "
+    return (
+        f"{report['input']}: {report['rows']:,} rows ({report['bytes'] / 1e6:.1f} MB) in {report['total']:.1f}s "
+        f"({resumed}load {report['load']:.1f}s, allocate {report['allocate']:.1f}s, "
+        f"write {report['write']:.1f}s) -> {report['output']}"
+    )
+
+def run(args):
+    """Runs the `run` command; returns the process exit code."""
+    col_map = load_col_map(args.col_map)
+    inputs = expand_inputs(args.inputs)
+
+    # Check the output format before any file is allocated.
+    formats = STREAM_OUTPUT_FORMATS if args.stream else OUTPUT_FORMATS
+    if (file_format(args.out) if args.out else args.format) not in formats:
+        raise ValueError(f"Unsupported output format: {args.out or args.format}. Expected one of {formats}.")
+
+    if args.checkpoint_dir:
+        if args.stream or args.engine != "numpy" or args.workers != 1:
+            raise ValueError("--checkpoint-dir needs the numpy engine with --workers 1 and no --stream.")
+        os.makedirs(args.checkpoint_dir, exist_ok=True)
+
+    if args.out:
+        if len(inputs) != 1:
+            raise ValueError("--out takes a single input file; use --out-dir for several.")
+        targets = {inputs[0]: args.out}
+    else:
+        os.makedirs(args.out_dir, exist_ok=True)
+        targets = {path: output_path(path, args.out_dir, args.format) for path in inputs}
+
+        # Inputs with the same base name would be written to the same file
+        # by two processes at once.
+        clashes = {}
+        for path, out_path in targets.items():
+            clashes.setdefault(os.path.normcase(os.path.abspath(out_path)), []).append(path)
+        clashes = [paths for paths in clashes.values() if len(paths) > 1]
+        if clashes:
+            raise ValueError(
+                "Several inputs would be written to the same output file: "
+                + "; ".join(", ".join(paths) for paths in clashes)
+                + ". Rename them or run them with separate --out-dir values."
+            )
+
+    start = time.perf_counter()
+    failures = 0
+    total_rows = 0
+    profiles = []
+
+    context = multiprocessing.get_context("spawn")
+    with concurrent.futures.ProcessPoolExecutor(max_workers=args.jobs, mp_context=context) as pool:
+        futures = {
+            pool.submit(
+                run_file, path, out_path, col_map, args.engine, args.workers, args.compact,
+                args.sheet, args.mapped_only, args.stream, args.memory_mb, args.profile is not None,
+                args.checkpoint_dir, args.checkpoint_groups
+            ): path
+            for path, out_path in targets.items()
+        }
+        for future in concurrent.futures.as_completed(futures):
+            try:
+                report = future.result()
+            except Exception as e:
+                failures += 1
+                print(f"{futures[future]}: FAILED: {e}", file=sys.stderr, flush=True)
+            else:
+                total_rows += report['rows']
+                for warning in report.get('warnings', []):
+                    print(f"{report['input']}: warning: {warning}", file=sys.stderr, flush=True)
+                if report.get('profile') is not None:
+                    profiles.append({'input': report['input'], **report['profile']})
+                print(format_report(report), flush=True)
+
+    if args.profile is not None:
+        with open(args.profile, 'w', encoding='utf-8') as f:
+            json.dump(profiles, f, indent=2)
+
+    print(
+        f"Processed {len(targets) - failures} of {len(targets)} files, "
+        f"{total_rows:,} rows in {time.perf_counter() - start:.1f}s",
+        flush=True
+    )
+    return 1 if failures else 0
+
+def sweep(args):
+    """Runs the `sweep` command; returns the process exit code."""
+    col_map = load_col_map(args.col_map)
+    df = read_table(args.input, columns=mapped_columns(col_map), sheet=args.sheet)
+    df, problems = validate(df, col_map)
+    if any(problem['severity'] == 'error' for problem in problems):
+        raise ValidationError(problems)
+    for problem in problems:
+        print(f"{args.input}: warning: {format_problem(problem)}", file=sys.stderr, flush=True)
+    scenarios = rule_grid(
+        passes=args.passes, min_requirement=args.min_requirement, min_rest_per=args.min_rest_per
+    )
+
+    start = time.perf_counter()
+    table = allocate_sweep(df, col_map, scenarios, workers=args.workers)
+    print(table.to_string(index=False), flush=True)
+    if args.out:
+        write_table(table, args.out)
+    print(f"Ran {len(scenarios)} scenarios on {len(df):,} rows in {time.perf_counter() - start:.1f}s", flush=True)
+    return 0
+
+def build_parser():
+    """Builds the argument parser for the command line."""
+    parser = argparse.ArgumentParser(prog="python -m ficture_cli", description="Fixture allocation batch runner.")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    run_parser = commands.add_parser("run", help="Allocate one or more input files.")
+    run_parser.add_argument("inputs", nargs="+", help="Input files or glob patterns (CSV, Excel, Parquet or Feather).")
+    target = run_parser.add_mutually_exclusive_group()
+    target.add_argument("--out", help="Output file for a single input; the format follows its extension.")
+    target.add_argument("--out-dir", default=".", help="Directory for outputs when processing several files.")
+    run_parser.add_argument("--format", choices=OUTPUT_FORMATS, default="csv", help="Output format used with --out-dir.")
+    run_parser.add_argument("--col-map", help="JSON file mapping store, department, udf, mc_fic, cont_per and art to column names.")
+    run_parser.add_argument("--jobs", type=int, default=os.cpu_count() or 1, help="Files processed at the same time.")
+    run_parser.add_argument("--workers", type=int, default=1, help="Worker processes per file for the allocation itself.")
+    run_parser.add_argument("--engine", choices=ENGINES, default="numpy", help="Allocation engine.")
+    run_parser.add_argument("--compact", action="store_true", help="Write int32 allocations without the always-zero MC_BAl/FIC_REQ columns.")
+    run_parser.add_argument("--sheet", help="Excel sheet to read; defaults to the first one.")
+    run_parser.add_argument("--mapped-only", action="store_true", help="Read and write only the mapped columns.")
+    run_parser.add_argument("--stream", action="store_true", help="Process in chunks within --memory-mb, for inputs larger than RAM (CSV, Parquet or Feather output).")
+    run_parser.add_argument("--profile", metavar="JSON", help="Write per-phase timings and the slowest groups of each file to this JSON file (not with --stream).")
+    run_parser.add_argument("--memory-mb", type=int, default=MEMORY_MB, help="Memory ceiling per file for --stream.")
+    run_parser.add_argument("--checkpoint-dir", help="Save allocation progress here; rerunning an interrupted command resumes it.")
+    run_parser.add_argument("--checkpoint-groups", type=int, help="Also checkpoint every this many groups within a pass (with --checkpoint-dir).")
+    run_parser.set_defaults(func=run)
+
+    sweep_parser = commands.add_parser("sweep", help="Compare allocation totals over a grid of allocation rules.")
+    sweep_parser.add_argument("input", help="Input file (CSV, Excel, Parquet or Feather).")
+    sweep_parser.add_argument("--passes", type=int, nargs="+", default=[DEFAULT_RULES['passes']], help="Numbers of passes to run.")
+    sweep_parser.add_argument("--min-requirement", type=float, nargs="+", default=[DEFAULT_RULES['min_requirement']], help="Requirements above which pass 1 allocates a fixture.")
+    sweep_parser.add_argument("--min-rest-per", type=float, nargs="+", default=[DEFAULT_RULES['min_rest_per']], help="CONT%% shares that must be left after a row for pass 2 to allocate to it.")
+    sweep_parser.add_argument("--col-map", help="JSON file mapping store, department, udf, mc_fic, cont_per and art to column names.")
+    sweep_parser.add_argument("--sheet", help="Excel sheet to read; defaults to the first one.")
+    sweep_parser.add_argument("--workers", type=int, default=1, help="Worker processes the scenarios are spread over.")
+    sweep_parser.add_argument("--out", help="Also write the comparison table to this file (CSV, Parquet, Feather or Excel).")
+    sweep_parser.set_defaults(func=sweep)
+
+    return parser
+
+def main(argv=None):
+    """Parses `argv` and runs the selected command."""
+    args = build_parser().parse_args(argv)
+    try:
+        return args.func(args)
+    except (ValueError, FileNotFoundError) as e:
+        print(f"error: {e}", file=sys.stderr)
+        return 2
+
+if __name__ == "__main__":
+    sys.exit(main())
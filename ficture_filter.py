@@ -0,0 +1,128 @@
+import numpy as np
+import pandas as pd
+
+class FilterIndex:
+    """
+    Row positions of an allocation result per value of its filter columns,
+    built once per result so filtering never scans or copies the frame.
+
+    Missing key values are kept and offered as None.
+    """
+
+    def __init__(self, df, columns):
+        """
+        Args:
+            df (pd.DataFrame): The allocation result.
+            columns (dict): Filter key (e.g. 'store') -> column name.
+        """
+        self.n_rows = len(df)
+        self._sort_orders = {}
+        self._options = {}
+        self._codes = {}
+        self._order = {}
+        self._bounds = {}
+        for key, column in columns.items():
+            codes, uniques = pd.factorize(df[column])
+            values = list(uniques)
+            try:
+                ranks = np.argsort(np.asarray(uniques, dtype=object), kind='stable')
+            except TypeError:
+                # Mixed types (e.g. numbers and text) sort by their text.
+                ranks = np.argsort(np.asarray([str(value) for value in values], dtype=object), kind='stable')
+
+            # Renumber codes in sorted value order; missing values go last.
+            remap = np.empty(len(values) + 1, dtype=np.int64)
+            remap[ranks] = np.arange(len(values))
+            remap[-1] = len(values)
+            codes = remap[codes]
+
+            options = [values[r] for r in ranks]
+            if (codes == len(values)).any():
+                options.append(None)
+
+            order = np.argsort(codes, kind='stable')
+            self._options[key] = options
+            self._codes[key] = {value: code for code, value in enumerate(options)}
+            self._order[key] = order
+            self._bounds[key] = np.searchsorted(codes[order], np.arange(len(options) + 1))
+
+    def options(self, key):
+        """Returns the sorted distinct values of a filter column, None last for missing values."""
+        return self._options[key]
+
+    def positions(self, key, value):
+        """Returns the sorted row positions where the `key` column equals `value`."""
+        code = self._codes[key].get(value)
+        if code is None:
+            return np.zeros(0, dtype=np.int64)
+        bounds = self._bounds[key]
+        return self._order[key][bounds[code]:bounds[code + 1]]
+
+    def select(self, selections):
+        """
+        Returns the row positions matching every selection, or None when
+        nothing is selected (all rows).
+
+        Args:
+            selections (dict): Filter key -> selected value; keys that are
+                not present are not filtered on.
+        """
+        sets = sorted((self.positions(key, value) for key, value in selections.items()), key=len)
+        if not sets:
+            return None
+        positions = sets[0]
+        for other in sets[1:]:
+            positions = np.intersect1d(positions, other, assume_unique=True)
+        return positions
+
+    def sort_order(self, df, column, ascending=True):
+        """
+        Returns all row positions of `df` (the indexed result) sorted by
+        `column`, missing values last; computed once per column and direction.
+        """
+        key = (column, ascending)
+        if key not in self._sort_orders:
+            values = df[column].reset_index(drop=True)
+            try:
+                ordered = values.sort_values(ascending=ascending, kind='stable', na_position='last')
+            except TypeError:
+                # Mixed types (e.g. numbers and text) sort by their text.
+                ordered = values.astype(str).where(values.notna()).sort_values(
+                    ascending=ascending, kind='stable', na_position='last'
+                )
+            self._sort_orders[key] = ordered.index.to_numpy()
+        return self._sort_orders[key]
+
+    def page(self, df, positions=None, sort_by=None, ascending=True, page=0, page_size=100, columns=None):
+        """
+        Returns one page of rows, for showing results without sending the
+        whole frame to the browser.
+
+        Args:
+            df (pd.DataFrame): The indexed result.
+            positions (np.ndarray, optional): Rows to page through, as
+                returned by select; None for every row.
+            sort_by (str, optional): Column to sort by; input order otherwise.
+            ascending (bool): Sort direction.
+            page (int): Zero-based page number.
+            page_size (int): Rows per page.
+            columns (list, optional): Columns to return; all by default.
+
+        Returns:
+            pd.DataFrame: The rows of the page.
+        """
+        if sort_by is not None:
+            order = self.sort_order(df, sort_by, ascending)
+            if positions is not None:
+                selected = np.zeros(self.n_rows, dtype=bool)
+                selected[positions] = True
+                order = order[selected[order]]
+        else:
+            order = positions
+
+        start = page * page_size
+        if order is None:
+            rows = np.arange(min(start, self.n_rows), min(start + page_size, self.n_rows))
+        else:
+            rows = order[start:start + page_size]
+        return df.iloc[rows] if columns is None else df.iloc[rows][columns]
@@ -0,0 +1,248 @@
+import gzip
+import importlib.util
+import os
+import shutil
+import tempfile
+import zipfile
+import pandas as pd
+
+# File extensions the allocator can read and write.
+INPUT_FORMATS = ('csv', 'xlsx', 'xls', 'parquet', 'feather')
+OUTPUT_FORMATS = ('csv', 'parquet', 'feather', 'xlsx')
+
+# MIME types used when offering a file for download.
+MIME_TYPES = {
+    'csv': 'text/csv',
+    'parquet': 'application/vnd.apache.parquet',
+    'feather': 'application/vnd.apache.arrow.file',
+    'xlsx': 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet',
+}
+
+# Compression for the columnar output formats.
+COMPRESSION = 'zstd'
+
+# Compression wrappers for exported files, and their file name suffixes.
+EXPORT_COMPRESSIONS = {None: '', 'gzip': '.gz', 'zip': '.zip'}
+
+# File name suffixes of finished exports.
+EXPORT_SUFFIXES = tuple(
+    f".{fmt}{suffix}" for fmt in OUTPUT_FORMATS for suffix in EXPORT_COMPRESSIONS.values()
+)
+
+# Rows serialised at a time when exporting.
+EXPORT_CHUNK_ROWS = 100_000
+
+# Excel reader: calamine (Rust, much faster) when python-calamine is
+# installed, otherwise pandas' default (openpyxl for .xlsx).
+EXCEL_ENGINE = 'calamine' if importlib.util.find_spec('python_calamine') else None
+
+def file_format(name):
+    """
+    Returns the lower-case extension of a file name, without the dot.
+    """
+    return os.path.splitext(str(name))[1].lower().lstrip('.')
+
+def mapped_columns(col_map):
+    """Returns the distinct column names of a column mapping, in order."""
+    return list(dict.fromkeys(col_map.values()))
+
+def input_size(file):
+    """Returns the size in bytes of a path, uploaded file or buffer."""
+    if isinstance(file, (str, os.PathLike)):
+        return os.path.getsize(file)
+    if getattr(file, 'size', None) is not None:
+        return file.size
+    return len(file.getbuffer())
+
+def _source(file, name):
+    """Rewinds file objects (they may have been read before) and returns the name to detect the format from."""
+    if hasattr(file, 'seek'):
+        file.seek(0)
+    return getattr(file, 'name', file) if name is None else name
+
+def sheet_names(file, name=None):
+    """Returns the sheet names of an Excel file, or [] for other formats."""
+    if file_format(_source(file, name)) not in ('xlsx', 'xls'):
+        return []
+    with pd.ExcelFile(file, engine=EXCEL_ENGINE) as book:
+        return list(book.sheet_names)
+
+def read_header(file, name=None, sheet=None):
+    """
+    Returns the column names of a file without loading its rows.
+
+    Args:
+        file (str or file-like): A path or an open/uploaded file.
+        name (str, optional): File name used to detect the format.
+        sheet (str, optional): Excel sheet; defaults to the first one.
+    """
+    fmt = file_format(_source(file, name))
+    if fmt == 'csv':
+        return list(pd.read_csv(file, nrows=0).columns)
+    elif fmt in ('xlsx', 'xls'):
+        return list(pd.read_excel(file, sheet_name=sheet or 0, nrows=0, engine=EXCEL_ENGINE).columns)
+    elif fmt == 'parquet':
+        import pyarrow.parquet as pq
+        return [name for name in pq.read_schema(file).names if not name.startswith('__index_level_')]
+    elif fmt == 'feather':
+        import pyarrow.ipc as ipc
+        return list(ipc.open_file(file).schema.names)
+    else:
+        raise ValueError(f"Unsupported file format: {name}. Expected one of {INPUT_FORMATS}.")
+
+def read_table(file, name=None, columns=None, sheet=None):
+    """
+    Reads a CSV, Excel, Parquet or Feather (Arrow IPC) file into a DataFrame
+    based on its extension.
+
+    Args:
+        file (str or file-like): A path or an open/uploaded file.
+        name (str, optional): File name used to detect the format. Defaults
+            to `file.name` for file objects and to the path itself otherwise.
+        columns (list, optional): Only read these columns.
+        sheet (str, optional): Excel sheet; defaults to the first one.
+
+    Raises:
+        ValueError: If the format is not one of INPUT_FORMATS.
+    """
+    name = _source(file, name)
+    fmt = file_format(name)
+    if fmt == 'csv':
+        return pd.read_csv(file, usecols=columns)
+    elif fmt in ('xlsx', 'xls'):
+        return pd.read_excel(file, sheet_name=sheet or 0, usecols=columns, engine=EXCEL_ENGINE)
+    elif fmt == 'parquet':
+        return pd.read_parquet(file, columns=columns)
+    elif fmt == 'feather':
+        return pd.read_feather(file, columns=columns)
+    else:
+        raise ValueError(f"Unsupported file format: {name}. Expected one of {INPUT_FORMATS}.")
+
+def _arrow_compatible(df):
+    """
+    Returns `df` with the object columns that mix numbers and text (common
+    in Excel files) converted to text, missing values kept, so Arrow can
+    store them. Other columns are left as they are.
+    """
+    mixed = [
+        col for col in df.columns
+        if df[col].dtype == object and pd.api.types.infer_dtype(df[col], skipna=True) in ('mixed', 'mixed-integer')
+    ]
+    if not mixed:
+        return df
+    df = df.copy(deep=False)
+    for col in mixed:
+        df[col] = df[col].astype(str).where(df[col].notna())
+    return df
+
+def write_table(df, target, fmt=None):
+    """
+    Writes a DataFrame to `target` without its index. Parquet and Feather
+    output is compressed with COMPRESSION, and columns that mix numbers and
+    text are written as text.
+
+    Args:
+        df (pd.DataFrame): The data to write.
+        target (str or file-like): A path or a binary buffer.
+        fmt (str, optional): One of OUTPUT_FORMATS; defaults to the
+            extension of `target`.
+
+    Raises:
+        ValueError: If the format is not one of OUTPUT_FORMATS.
+    """
+    if fmt is None:
+        fmt = file_format(target)
+
+    if fmt == 'csv':
+        df.to_csv(target, index=False)
+    elif fmt == 'parquet':
+        _arrow_compatible(df).to_parquet(target, index=False, compression=COMPRESSION)
+    elif fmt == 'feather':
+        # Feather stores no index, and requires a default one.
+        _arrow_compatible(df).reset_index(drop=True).to_feather(target, compression=COMPRESSION)
+    elif fmt == 'xlsx':
+        df.to_excel(target, index=False)
+    else:
+        raise ValueError(f"Unsupported output format: {target}. Expected one of {OUTPUT_FORMATS}.")
+
+def _temp_path(path):
+    """Creates an empty temporary file next to `path`, named `path`.*.tmp, and returns its path."""
+    fd, tmp = tempfile.mkstemp(
+        dir=os.path.dirname(os.path.abspath(path)), prefix=os.path.basename(path) + '.', suffix='.tmp'
+    )
+    os.close(fd)
+    return tmp
+
+def _write_chunks(df, path, fmt, chunk_rows):
+    """Writes `df` to `path` in `fmt` ('csv', 'parquet' or 'feather'), `chunk_rows` rows at a time."""
+    chunks = (df.iloc[start:start + chunk_rows] for start in range(0, max(len(df), 1), chunk_rows))
+    if fmt == 'csv':
+        with open(path, 'w', encoding='utf-8', newline='') as f:
+            for i, chunk in enumerate(chunks):
+                chunk.to_csv(f, header=i == 0, index=False)
+    else:
+        import pyarrow as pa
+        schema = pa.Schema.from_pandas(df, preserve_index=False)
+        if fmt == 'parquet':
+            import pyarrow.parquet as pq
+            writer = pq.ParquetWriter(path, schema, compression=COMPRESSION)
+        else:
+            import pyarrow.ipc as ipc
+            writer = ipc.new_file(path, schema, options=ipc.IpcWriteOptions(compression=COMPRESSION))
+        with writer:
+            for chunk in chunks:
+                writer.write_table(pa.Table.from_pandas(chunk, schema=schema, preserve_index=False))
+
+def export_table(df, path, fmt, compression=None, chunk_rows=EXPORT_CHUNK_ROWS, name=None):
+    """
+    Writes a DataFrame to a file `chunk_rows` rows at a time, so the whole
+    serialised output is never held in memory, then optionally compresses it.
+    As in write_table, Parquet and Feather store mixed columns as text.
+
+    The file is written under a temporary name ending in .tmp and renamed
+    into place once complete, so others sharing the directory never see a
+    partial export.
+
+    Args:
+        df (pd.DataFrame): The data to export.
+        path (str): Target path, without the compression suffix.
+        fmt (str): 'csv', 'parquet' or 'feather'.
+        compression (str, optional): A key of EXPORT_COMPRESSIONS.
+        name (str, optional): Name of the file inside a zip archive;
+            defaults to the base name of `path`.
+
+    Returns:
+        str: Path of the written file, with the compression suffix.
+
+    Raises:
+        ValueError: If the format or compression is not supported.
+    """
+    if compression not in EXPORT_COMPRESSIONS:
+        raise ValueError(f"Unsupported compression: {compression}. Expected one of {list(EXPORT_COMPRESSIONS)}.")
+    if fmt not in ('csv', 'parquet', 'feather'):
+        raise ValueError(f"Unsupported export format: {fmt}. Expected csv, parquet or feather.")
+
+    if fmt in ('parquet', 'feather'):
+        df = _arrow_compatible(df)
+    target = path + EXPORT_COMPRESSIONS[compression]
+    tmp = _temp_path(target)
+    try:
+        if compression is None:
+            _write_chunks(df, tmp, fmt, chunk_rows)
+        else:
+            raw = _temp_path(path)
+            try:
+                _write_chunks(df, raw, fmt, chunk_rows)
+                if compression == 'gzip':
+                    with open(raw, 'rb') as source, gzip.open(tmp, 'wb') as dest:
+                        shutil.copyfileobj(source, dest)
+                else:
+                    with zipfile.ZipFile(tmp, 'w', compression=zipfile.ZIP_DEFLATED) as archive:
+                        archive.write(raw, arcname=name or os.path.basename(path))
+            finally:
+                os.remove(raw)
+        os.replace(tmp, target)
+    except BaseException:
+        os.remove(tmp)
+        raise
+    return target
@@ -0,0 +1,152 @@
+"""
+Background allocation jobs shared by every session of the app.
+
+Jobs run on a bounded thread pool, so a Streamlit script run only submits
+a job and polls it, and reruns or other users do not interrupt it. Each job
+receives a progress callback that also raises JobCancelled once the job is
+cancelled, which stops the allocation at its next progress update.
+"""
+import concurrent.futures
+import threading
+import time
+import uuid
+
+# Worker threads, and jobs allowed to wait for one, per JobManager.
+MAX_WORKERS = 2
+MAX_QUEUED = 8
+
+# Finished jobs that were never collected are dropped after this many seconds.
+KEEP_SECONDS = 3600
+
+class JobCancelled(Exception):
+    """Raised inside a job's progress callback once the job is cancelled."""
+
+class QueueFull(RuntimeError):
+    """Raised by JobManager.submit when MAX_QUEUED jobs are already waiting."""
+
+class Job:
+    """
+    One submitted function call.
+
+    Attributes:
+        id (str): Job id, unique within the manager.
+        status (str): 'queued', 'running', 'done', 'failed' or 'cancelled'.
+        progress (tuple): Last (pass_no, groups_done, groups_total,
+            elapsed_seconds) reported, or None.
+        result: Return value of the function once done.
+        error (BaseException): Exception raised by the function, if it failed.
+        submitted, started, finished (float): time.time() of submission,
+            start and completion.
+    """
+
+    def __init__(self):
+        self.id = uuid.uuid4().hex
+        self.status = 'queued'
+        self.progress = None
+        self.result = None
+        self.error = None
+        self.submitted = time.time()
+        self.started = None
+        self.finished = None
+        self.future = None
+        self._cancel = threading.Event()
+
+    @property
+    def active(self):
+        """Whether the job is queued or running."""
+        return self.status in ('queued', 'running')
+
+    def report_progress(self, pass_no, groups_done, groups_total, elapsed_seconds):
+        """Progress callback handed to the job; raises JobCancelled after cancel()."""
+        if self._cancel.is_set():
+            raise JobCancelled(self.id)
+        self.progress = (pass_no, groups_done, groups_total, elapsed_seconds)
+
+    def cancel(self):
+        """Cancels a queued job, or stops a running one at its next progress update."""
+        self._cancel.set()
+        if self.future is not None and self.future.cancel():
+            self._finish('cancelled')
+
+    def _run(self, function, args, kwargs):
+        if self._cancel.is_set():
+            self._finish('cancelled')
+            return
+        self.status = 'running'
+        self.started = time.time()
+        try:
+            self.result = function(*args, progress=self.report_progress, **kwargs)
+        except JobCancelled:
+            self._finish('cancelled')
+        except Exception as e:
+            self.error = e
+            self._finish('failed')
+        else:
+            self._finish('done')
+
+    def _finish(self, status):
+        self.status = status
+        self.finished = time.time()
+
+class JobManager:
+    """
+    Runs jobs on a pool of `max_workers` threads with at most `max_queued`
+    jobs waiting. Safe to share between sessions.
+    """
+
+    def __init__(self, max_workers=MAX_WORKERS, max_queued=MAX_QUEUED):
+        self.max_workers = max_workers
+        self.max_queued = max_queued
+        self._pool = concurrent.futures.ThreadPoolExecutor(max_workers, thread_name_prefix='ficture-job')
+        self._jobs = {}
+        self._lock = threading.Lock()
+
+    def submit(self, function, *args, **kwargs):
+        """
+        Queues `function(*args, progress=callback, **kwargs)`.
+
+        Returns:
+            str: The job id.
+
+        Raises:
+            QueueFull: If `max_queued` jobs are already waiting for a worker.
+        """
+        job = Job()
+        with self._lock:
+            self._prune()
+            waiting = sum(other.status == 'queued' for other in self._jobs.values())
+            if waiting >= self.max_queued:
+                raise QueueFull(f"{waiting} allocation jobs are already waiting; try again shortly.")
+            self._jobs[job.id] = job
+            job.future = self._pool.submit(job._run, function, args, kwargs)
+        return job.id
+
+    def get(self, job_id):
+        """Returns the Job with `job_id`, or None if it is unknown or was dropped."""
+        return self._jobs.get(job_id)
+
+    def cancel(self, job_id):
+        """Cancels the job with `job_id`, if it is still active."""
+        job = self.get(job_id)
+        if job is not None and job.active:
+            job.cancel()
+
+    def pop(self, job_id):
+        """Removes and returns a job, typically once its result was collected."""
+        with self._lock:
+            return self._jobs.pop(job_id, None)
+
+    def queue_position(self, job_id):
+        """Returns how many queued jobs were submitted before `job_id`."""
+        job = self.get(job_id)
+        if job is None:
+            return 0
+        return sum(
+            other.status == 'queued' and other.submitted < job.submitted
+            for other in list(self._jobs.values())
+        )
+
+    def _prune(self):
+        cutoff = time.time() - KEEP_SECONDS
+        for job_id in [job_id for job_id, job in self._jobs.items() if job.finished and job.finished < cutoff]:
+            del self._jobs[job_id]
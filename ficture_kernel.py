@@ -0,0 +1,72 @@
+"""
+Numba-compiled allocation pass loop, used by the array engine in place of
+_run_pass when numba is installed (see ficture_processing.KERNEL).
+
+The compiled code is cached on disk (cache=True): next to this file when
+its __pycache__ is writable, otherwise in numba's user cache directory, or
+NUMBA_CACHE_DIR when set. Only the first process after installing or
+upgrading pays for the compilation.
+"""
+import numba
+import numpy as np
+
+from ficture_processing import ALLOCATION_MAX, ALLOCATION_OVERFLOW
+
+@numba.njit(cache=True, nogil=True)
+def run_pass(pass_no, offsets, init_req, slots, rest, mc_bal, req, seen, min_requirement, min_rest_per, alloc):
+    """
+    Runs one allocation pass over rows already laid out in processing order,
+    with the same rules and arithmetic as ficture_processing._run_pass.
+
+    Args:
+        pass_no (int): The pass being run (0, 1 or 2).
+        offsets (np.ndarray): Group boundaries; group g spans offsets[g]:offsets[g+1].
+        init_req (np.ndarray): Initial fixture requirement per row.
+        slots (np.ndarray): Article slot per row, -1 when the article is missing.
+        rest (np.ndarray): rest_per per row.
+        mc_bal (np.ndarray): Remaining fixture balance per group, updated in place.
+        req (np.ndarray): Remaining requirement per article slot, updated in place.
+        seen (np.ndarray): Whether each slot's requirement is set in `req`
+            (rather than taken from the row), updated in place.
+        min_requirement, min_rest_per (float): Thresholds of passes 1 and 2.
+        alloc (np.ndarray): Receives the allocation per row.
+
+    Raises:
+        OverflowError: As _run_pass, rather than wrapping around in the
+            int32 `alloc`.
+    """
+    for g in range(len(offsets) - 1):
+        bal = mc_bal[g]
+        for k in range(offsets[g], offsets[g + 1]):
+            s = slots[k]
+            if s >= 0 and seen[s]:
+                fic_req = req[s]
+            else:
+                fic_req = init_req[k]
+
+            allocate = 0
+            if pass_no == 0:
+                if bal >= 1 and fic_req > min_requirement:
+                    allocate = 1
+            elif pass_no == 1:
+                if bal > fic_req and rest[k] >= min_rest_per:
+                    if not abs(fic_req) <= ALLOCATION_MAX:
+                        raise OverflowError(ALLOCATION_OVERFLOW)
+                    allocate = int(np.rint(fic_req))
+            elif pass_no == 2:
+                if fic_req > 0 and bal > 0:
+                    if not bal <= ALLOCATION_MAX:
+                        raise OverflowError(ALLOCATION_OVERFLOW)
+                    allocate = int(np.rint(bal))
+
+            # max(x, 0) as Python evaluates it, which keeps NaN.
+            bal = bal - allocate
+            if 0 > bal:
+                bal = 0.0
+            if s >= 0:
+                left = fic_req - allocate
+                req[s] = 0.0 if 0 > left else left
+                seen[s] = True
+            alloc[k] = allocate
+
+        mc_bal[g] = bal
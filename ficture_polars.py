@@ -0,0 +1,59 @@
+"""
+Polars implementation of the set-oriented stages of the array engine,
+used in place of the NumPy ones when FICTURE_BACKEND=polars (see
+ficture_processing.BACKEND). Polars runs them on all cores.
+
+Every function returns exactly what its NumPy counterpart in
+ficture_processing._NumpyBackend returns: sorts keep tied rows in input
+order, and cumulative sums add the rows one after the other in the same
+order, so the floats come out bit for bit the same. The one exception is
+group_totals, see there.
+"""
+import numpy as np
+import polars as pl
+
+def group_rows(codes):
+    """Stable argsort of group codes, as np.argsort(codes, kind="stable")."""
+    frame = pl.DataFrame({'group': codes}).with_row_index('row')
+    return frame.sort('group', maintain_order=True)['row'].to_numpy().astype(np.int64)
+
+def sort_by_group(group_of, key):
+    """
+    Positions sorted by group ascending, then key descending with NaNs last,
+    ties in input order; as np.lexsort((-key, group_of)).
+    """
+    frame = pl.DataFrame({'group': group_of, 'key': key}).with_row_index('pos')
+    return frame.with_columns(pl.col('key').fill_nan(None)).sort(
+        ['group', 'key'], descending=[False, True], nulls_last=True, maintain_order=True
+    )['pos'].to_numpy().astype(np.int64)
+
+def rest_per(offsets, cont, blocks):
+    """
+    rest_per of rows in processing order, as ficture_processing._rest_per:
+    the reverse cumulative sum of CONT% within each group, shifted by one
+    row. A missing CONT% adds nothing to the sum, and the row after it gets
+    0 rather than the sum so far.
+    """
+    group = np.repeat(np.arange(len(offsets) - 1, dtype=np.int64), np.diff(offsets))
+    # Summed from the last row of each group up, as the reference does.
+    rest = pl.LazyFrame({'group': group[::-1], 'cont': cont[::-1]}).select(
+        pl.when(pl.col('group') == pl.col('group').shift(1))
+        .then(
+            pl.when(pl.col('cont').is_nan()).then(0.0)
+            .otherwise(pl.col('cont').fill_nan(0.0).cum_sum().over('group'))
+            .shift(1)
+        )
+        .otherwise(0.0)
+    ).collect().to_series().to_numpy()
+    return rest[::-1].astype(np.float64)
+
+def group_totals(group_of, values, n_groups):
+    """
+    Sum of `values` per group, as np.bincount(group_of, weights=values,
+    minlength=n_groups). The sums are added in parallel, so they are only
+    bit for bit the same for whole numbers, such as allocations.
+    """
+    totals = pl.DataFrame({'group': group_of, 'value': values}).group_by('group').agg(pl.col('value').sum())
+    out = np.zeros(n_groups)
+    out[totals['group'].to_numpy()] = totals['value'].to_numpy()
+    return out
@@ -1,22 +1,393 @@
-import streamlit as st
 import pandas as pd
 import numpy as np
-from datetime import datetime
+from datetime import timedelta
+import concurrent.futures
+import contextlib
+import importlib.util
+import itertools
+import multiprocessing
+import os
+import tempfile
 import time
+import zipfile
 
-def ficture_allocation(df, status_placeholder, col_map):
+# Available allocation engines. "numpy" is the array-based engine used by
+# default; "reference" is the original row-by-row implementation, kept so
+# results can be checked against it.
+ENGINES = ("numpy", "reference")
+
+# Implementation of the numpy engine's pass loop: "numba" (compiled, see
+# ficture_kernel) when numba is installed, otherwise "python". The
+# FICTURE_KERNEL environment variable overrides the choice. Profiled runs,
+# and installs where numba fails to import, use the Python loop.
+KERNELS = ("python", "numba")
+KERNEL = os.environ.get('FICTURE_KERNEL') or ('numba' if importlib.util.find_spec('numba') else 'python')
+
+# Library running the set-oriented stages of the numpy engine (grouping, the
+# per-pass sorts, rest_per and the cube totals): "numpy", single-threaded, or
+# "polars" (see ficture_polars), multi-threaded. Both give identical results.
+# Set with the FICTURE_BACKEND environment variable.
+BACKENDS = ("numpy", "polars")
+BACKEND = os.environ.get('FICTURE_BACKEND') or 'numpy'
+
+# Number of allocation passes run by the engines.
+PASSES = 3
+
+# Allocation rules used when none are given: how many of the passes run,
+# the requirement a row needs for pass 1 to allocate it a fixture
+# (fic_req > min_requirement), and the share of CONT% that must be left after
+# a row for pass 2 to allocate to it (rest_per >= min_rest_per).
+DEFAULT_RULES = {
+    'passes': PASSES,
+    'min_requirement': 0.4,
+    'min_rest_per': 0.1,
+}
+
+# Largest allocation the int32 result columns hold. The pass loops raise
+# OverflowError(ALLOCATION_OVERFLOW) for a larger or infinite one.
+ALLOCATION_MAX = int(np.iinfo(np.int32).max)
+ALLOCATION_OVERFLOW = "An allocation does not fit the result columns: MC FIX or CONT% is too large or infinite."
+
+# Version of the allocation rules. Bump it whenever a change alters the
+# allocation results; cached results are keyed on it.
+ALLOCATION_VERSION = 1
+
+# Column names used when no mapping is given.
+DEFAULT_COL_MAP = {
+    'store': 'STORE',
+    'department': 'DEPARTMENT',
+    'udf': 'UDF-06',
+    'mc_fic': 'MC FIX',
+    'cont_per': 'CONT%',
+    'art': 'ART'
+}
+
+def allocate(df, col_map, engine="numpy", workers=1, progress=None, progress_interval_ms=250,
+             compact=False, profile=None, rules=None, checkpoint=None):
     """
-    Performs the fixture allocation process and updates a Streamlit UI element
-    with the current progress and elapsed time.
-    
+    Performs the fixture allocation process. Has no UI dependency, so it can
+    be used from batch jobs and tests as well as the Streamlit app.
+
     Args:
         df (pd.DataFrame): The input DataFrame.
-        status_placeholder (streamlit.delta_generator.DeltaGenerator):
-            A placeholder to update the UI with processing status.
         col_map (dict): A dictionary mapping generic column names to user-defined names.
+        engine (str): Allocation engine to use, one of ENGINES.
+        workers (int, optional): Worker processes for the numpy engine. Stores
+            are split across the pool when greater than 1; None uses every CPU.
+            The output is identical to a serial run.
+        progress (callable, optional): Called as
+            progress(pass_no, groups_done, groups_total, elapsed_seconds)
+            while the allocation runs, and once more when it finishes.
+            pass_no is None when the passes run inside worker processes.
+        progress_interval_ms (int): Minimum time between two progress calls.
+        compact (bool): Return int32 allocation columns and leave out the
+            MC_BAl_i / FIC_REQ_i columns, which are always zero (numpy engine).
+        profile (Profile, optional): Filled in with phase timings and the
+            slowest groups of this run.
+        rules (dict, optional): Allocation rules overriding DEFAULT_RULES.
+            Passes that do not run leave their Allocate column at zero.
+        checkpoint (Checkpoint, optional): Saves the run's progress as it
+            goes and resumes from an earlier snapshot of the same run
+            (numpy engine with workers=1).
+
+    Returns:
+        pd.DataFrame: A copy of `df` with the allocation columns added.
+    """
+    rules = resolve_rules(rules)
+    if checkpoint is not None and (engine != "numpy" or workers != 1):
+        raise ValueError("Checkpoints need the numpy engine with workers=1.")
+    tick = _ProgressReporter(progress, progress_interval_ms) if progress is not None else None
+    start = time.perf_counter()
+
+    if engine == "numpy":
+        if workers is None:
+            workers = os.cpu_count() or 1
+        with _phase(profile, 'project', rows=len(df)):
+            work = project(df, col_map)
+        if workers > 1:
+            results = _allocate_parallel(work, workers, tick, profile, rules)
+        else:
+            results = allocate_arrays(work, tick, profile, rules, checkpoint)
+        with _phase(profile, 'assemble', rows=len(df)):
+            df_1 = assemble_result(df, results, compact)
+    elif engine == "reference":
+        df_1 = _ficture_allocation_reference(df, col_map, tick, profile, rules)
+    else:
+        raise ValueError(f"Unknown allocation engine: {engine!r}. Expected one of {ENGINES}.")
+
+    if profile is not None:
+        profile.finish(df, col_map, time.perf_counter() - start)
+    return df_1
+
+def resolve_rules(rules=None):
+    """
+    Returns `rules` with the DEFAULT_RULES values it leaves out filled in.
+
+    Raises:
+        ValueError: For unknown rule names or a pass count outside 1..PASSES.
+    """
+    rules = dict(DEFAULT_RULES, **(rules or {}))
+    unknown = set(rules) - set(DEFAULT_RULES)
+    if unknown:
+        raise ValueError(f"Unknown allocation rules: {sorted(unknown)}. Expected {sorted(DEFAULT_RULES)}.")
+    if rules['passes'] not in range(1, PASSES + 1):
+        raise ValueError(f"passes must be between 1 and {PASSES}, got {rules['passes']!r}.")
+    rules['passes'] = int(rules['passes'])
+    rules['min_requirement'] = float(rules['min_requirement'])
+    rules['min_rest_per'] = float(rules['min_rest_per'])
+    return rules
+
+def resume_allocation(df, col_map, path, every_groups=None, **options):
+    """
+    Continues the allocation run that left a checkpoint at `path`.
+
+    Args:
+        df (pd.DataFrame): The same input the interrupted run was given.
+        col_map (dict): The same column mapping.
+        path (str): Its checkpoint file.
+        every_groups (int, optional): See Checkpoint.
+        **options: Further allocate arguments; `rules` must match the
+            interrupted run's.
+
+    Raises:
+        FileNotFoundError: If there is no checkpoint at `path`.
+        ValueError: If the checkpoint belongs to other input or rules.
+    """
+    if not os.path.exists(path):
+        raise FileNotFoundError(f"No allocation checkpoint at {path}")
+    return allocate(df, col_map, checkpoint=Checkpoint(path, every_groups, required=True), **options)
+
+def ficture_allocation(df, status_placeholder, col_map, engine="numpy", workers=1):
+    """
+    Performs the fixture allocation process and updates a UI element (anything
+    with a `write` method, e.g. a Streamlit placeholder) with the current
+    progress and elapsed time. See allocate for the remaining arguments.
+    """
+    def progress(*args):
+        status_placeholder.write(format_progress(*args))
+
+    return allocate(df, col_map, engine, workers, progress=progress)
+
+def format_progress(pass_no, groups_done, groups_total, elapsed_seconds):
+    """Formats a progress callback's arguments as a one-line status message."""
+    elapsed_time = str(timedelta(seconds=int(elapsed_seconds))) # Format to HH:MM:SS
+    stage = "Processing stores" if pass_no is None else f"Processing Pass {pass_no+1}"
+    return f"{stage}... {groups_done:,} of {groups_total:,} groups. Elapsed Time: {elapsed_time}"
+
+class _ProgressReporter:
+    """
+    Forwards progress to a callback at most once every `interval_ms`
+    milliseconds; calls made with force=True are always forwarded.
+    """
+
+    def __init__(self, callback, interval_ms):
+        self.callback = callback
+        self.interval = interval_ms / 1000
+        self.start = time.perf_counter()
+        self.last = None
+
+    def __call__(self, pass_no, groups_done, groups_total, force=False):
+        now = time.perf_counter()
+        if not force and self.last is not None and now - self.last < self.interval:
+            return
+        self.last = now
+        self.callback(pass_no, groups_done, groups_total, now - self.start)
+
+class Profile:
+    """
+    Where the time of an allocation run goes. Pass one to allocate(profile=...)
+    to fill it in; without one nothing is measured.
+
+    Attributes:
+        phases (list): One dict per phase and pass, with 'phase', 'pass'
+            (None outside the passes), 'seconds' and 'rows'. In parallel runs
+            the pass phases add up the time of every worker.
+        hot_groups (list): The `top_n` slowest (store, department, UDF)
+            groups over all passes, slowest first, as dicts with 'store',
+            'department', 'udf', 'rows' and 'seconds'.
+        total_seconds (float): Wall time of the run.
+    """
+
+    def __init__(self, top_n=10):
+        self.top_n = top_n
+        self.phases = []
+        self.hot_groups = []
+        self.total_seconds = 0.0
+        # (first row position, rows, seconds) arrays from the numpy engine,
+        # and label -> [rows, seconds] from the reference engine.
+        self._group_arrays = []
+        self._group_labels = {}
+
+    @contextlib.contextmanager
+    def phase(self, name, pass_no=None, rows=0):
+        """Times the enclosed block as `name`; see add."""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add(name, time.perf_counter() - start, pass_no, rows)
+
+    def add(self, name, seconds, pass_no=None, rows=0):
+        """Adds time and rows to a phase, creating it on first use."""
+        rows = int(rows)
+        for entry in self.phases:
+            if entry['phase'] == name and entry['pass'] == pass_no:
+                entry['seconds'] += seconds
+                entry['rows'] += rows
+                return
+        self.phases.append({'phase': name, 'pass': pass_no, 'seconds': seconds, 'rows': rows})
+
+    def add_groups(self, first_rows, rows, seconds):
+        """Records per-group times given as arrays keyed by each group's first row position."""
+        self._group_arrays.append((np.asarray(first_rows), np.asarray(rows), np.asarray(seconds)))
+
+    def add_group(self, label, rows, seconds):
+        """Records time spent on the group with key values `label`."""
+        entry = self._group_labels.setdefault(label, [rows, 0.0])
+        entry[1] += seconds
+
+    def merge(self, other, rows):
+        """Adds a worker's profile, whose row positions index `rows`."""
+        for entry in other.phases:
+            self.add(entry['phase'], entry['seconds'], entry['pass'], entry['rows'])
+        for first_rows, sizes, seconds in other._group_arrays:
+            self.add_groups(rows[first_rows], sizes, seconds)
+
+    def finish(self, df, col_map, total_seconds):
+        """Resolves the slowest groups to their key values in `df`."""
+        self.total_seconds = total_seconds
+        keys = [col_map['store'], col_map['department'], col_map['udf']]
+        candidates = [
+            (seconds, rows, label) for label, (rows, seconds) in self._group_labels.items()
+        ]
+        if self._group_arrays:
+            first_rows, sizes, seconds = (np.concatenate(arrays) for arrays in zip(*self._group_arrays))
+            top = np.argsort(-seconds, kind="stable")[:self.top_n]
+            values = df[keys].iloc[first_rows[top]].to_numpy(dtype=object)
+            candidates += [
+                (float(seconds[t]), int(sizes[t]), tuple(label)) for t, label in zip(top, values)
+            ]
+
+        candidates.sort(key=lambda candidate: -candidate[0])
+        self.hot_groups = [
+            {
+                'store': plain_value(label[0]), 'department': plain_value(label[1]), 'udf': plain_value(label[2]),
+                'rows': rows, 'seconds': seconds
+            }
+            for seconds, rows, label in candidates[:self.top_n]
+        ]
+        self._group_arrays = []
+        self._group_labels = {}
+
+    def to_dict(self):
+        """Returns the profile as plain, JSON-serialisable data."""
+        return {'total_seconds': self.total_seconds, 'phases': self.phases, 'hot_groups': self.hot_groups}
+
+class Checkpoint:
+    """
+    Snapshots of a running allocation on disk, so a run that is interrupted
+    (a closed session, a restarted process) continues where it stopped
+    instead of starting over. Pass one to allocate(checkpoint=...): the run
+    saves a snapshot after every pass and, with `every_groups`, every that
+    many groups within a pass, resumes from a snapshot at `path` that an
+    earlier run of the same input and rules left, and removes the file once
+    it completes.
+
+    A snapshot holds the remaining fixture balance per group, the remaining
+    requirement per article slot and the allocations made so far, about 12
+    bytes per row. Snapshots are taken between blocks of BLOCK_ROWS rows, so
+    `every_groups` is rounded up to whole blocks.
+
+    Attributes:
+        path (str): The snapshot file (.npz).
+        every_groups (int): Groups between snapshots within a pass; None
+            for pass boundaries only.
+        required (bool): Raise ValueError rather than start over when the
+            snapshot at `path` belongs to other input or rules, or cannot be read.
+        resumed_from (tuple): (pass_no, group) the run resumed at, or None
+            if it started from scratch.
+    """
+
+    def __init__(self, path, every_groups=None, required=False):
+        self.path = path
+        self.every_groups = every_groups
+        self.required = required
+        self.resumed_from = None
+        self._key = None
+
+    def bind(self, work, rules):
+        """Ties the checkpoint to a working frame and rules; snapshots of others are not resumed."""
+        row_hash = pd.util.hash_pandas_object(work, index=False).to_numpy()
+        weights = pd.util.hash_array(np.arange(len(work), dtype=np.uint64)) | np.uint64(1)
+        self._key = {
+            'version': np.int64(ALLOCATION_VERSION),
+            'rows': np.int64(len(work)),
+            'fingerprint': np.add.reduce(row_hash * weights, dtype=np.uint64),
+            'rules': np.array([rules['passes'], rules['min_requirement'], rules['min_rest_per']]),
+        }
+
+    def load(self):
+        """
+        Returns the saved state as a dict with 'pass_no', 'next_group',
+        'mc_bal', 'req' and 'allocations', or None when there is no
+        matching snapshot. An unreadable snapshot (e.g. cut short by a full
+        disk) counts as none.
+        """
+        if not os.path.exists(self.path):
+            return None
+        try:
+            with np.load(self.path) as snapshot:
+                state = {name: snapshot[name] for name in snapshot.files}
+        except (OSError, ValueError, EOFError, zipfile.BadZipFile) as e:
+            if self.required:
+                raise ValueError(f"The checkpoint at {self.path} cannot be read: {e}") from e
+            return None
+        if any(not np.array_equal(state.get(name), value) for name, value in self._key.items()):
+            if self.required:
+                raise ValueError(f"The checkpoint at {self.path} was written for other input or rules.")
+            return None
+        state['pass_no'] = int(state['pass_no'])
+        state['next_group'] = int(state['next_group'])
+        self.resumed_from = (state['pass_no'], state['next_group'])
+        return state
+
+    def save(self, pass_no, next_group, mc_bal, req, results):
+        """Atomically replaces the snapshot with the state before group `next_group` of pass `pass_no`."""
+        # A temporary file of its own, as runs on other threads may save the same checkpoint.
+        fd, tmp = tempfile.mkstemp(dir=os.path.dirname(os.path.abspath(self.path)), suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                np.savez(
+                    f, pass_no=pass_no, next_group=next_group, mc_bal=mc_bal, req=req,
+                    allocations=np.stack([results[f"Allocate_{i}"] for i in range(PASSES)]), **self._key
+                )
+            os.replace(tmp, self.path)
+        except BaseException:
+            os.remove(tmp)
+            raise
+
+    def remove(self):
+        """Deletes the snapshot, if any."""
+        with contextlib.suppress(FileNotFoundError):
+            os.remove(self.path)
+
+def plain_value(value):
+    """Converts numpy scalars to Python values, e.g. for reports and JSON."""
+    return value.item() if isinstance(value, np.generic) else value
+
+def _phase(profile, name, pass_no=None, rows=0):
+    """Profile.phase when profiling, otherwise a no-op context."""
+    if profile is None:
+        return contextlib.nullcontext()
+    return profile.phase(name, pass_no, rows)
+
+def _ficture_allocation_reference(df, col_map, tick=None, profile=None, rules=DEFAULT_RULES):
+    """
+    Original row-by-row implementation of the fixture allocation.
+
+    Kept as the reference the array engine is validated against; see
+    allocate for the arguments.
     """
-    start_time = datetime.now()
-    
     # Assign column names from the map for easier use
     store_name = col_map['store']
     department = col_map['department']
@@ -31,9 +402,11 @@ def ficture_allocation(df, status_placeholder, col_map):
     fict_bal_dict = {}
     fict_req_dict = {}
 
-    passes = 3 
+    passes = rules['passes']
+    min_requirement = rules['min_requirement']
+    min_rest_per = rules['min_rest_per']
 
-    for i in range(passes):
+    for i in range(PASSES):
         df_1[f"Allocate_{i}"] = np.zeros(len(df_1))
         df_1[f"MC_BAl_{i}"] = np.zeros(len(df_1))
         df_1[f"FIC_REQ_{i}"] = np.zeros(len(df_1))
@@ -42,35 +415,35 @@ def ficture_allocation(df, status_placeholder, col_map):
 
     # --- 🎯 Step 3 & 4: Group and Process Data (with new outer loop structure) ---
     for i in range(passes): # i will be 0, 1, 2
-        # Update the UI with the current pass and elapsed time
-        elapsed_time = datetime.now() - start_time
-        elapsed_time = str(elapsed_time).split('.')[0] # Format to HH:MM:SS   
-        status_placeholder.write(f"Processing Pass {i+1} of {passes}... Elapsed Time: {elapsed_time}")
-        
-        # A small delay to make the time update visible in the UI
-        time.sleep(1)
-
+        pass_start = time.perf_counter()
         grouped_data = df_1.groupby([store_name, department, udf])
 
-        for (store, dep, disp), group in grouped_data:
+        for g, ((store, dep, disp), group) in enumerate(grouped_data):
+            if tick is not None:
+                tick(i, g, grouped_data.ngroups)
+            group_start = time.perf_counter()
+
             mc_fic_val = group[mc_fic].iloc[0]
 
-            if i <= 1:
-                sorted_group = group.sort_values(cont_per, ascending=False).copy()
-            else:
-                sorted_group = group.sort_values(f"FIC_REQ_{i-1}", ascending=False).copy()
+            with _phase(profile, 'sort', i, len(group)):
+                if i <= 1:
+                    sorted_group = group.sort_values(cont_per, ascending=False).copy()
+                else:
+                    sorted_group = group.sort_values(f"FIC_REQ_{i-1}", ascending=False).copy()
             
             original_indices = sorted_group.index.to_numpy()
 
             initial_req_fic_group = sorted_group[cont_per] * sorted_group[mc_fic]
             
-            reverse_cumsum = sorted_group[cont_per][::-1].cumsum()[::-1]
-            rest_per_group = reverse_cumsum.shift(-1).fillna(0.0)
+            with _phase(profile, 'rest_per', i, len(group)):
+                reverse_cumsum = sorted_group[cont_per][::-1].cumsum()[::-1]
+                rest_per_group = reverse_cumsum.shift(-1).fillna(0.0)
             
-            df_1.loc[original_indices, 'rest_per'] = rest_per_group.values
+                df_1.loc[original_indices, 'rest_per'] = rest_per_group.values
 
             mc_bal = fict_bal_dict.get((store, dep, disp), mc_fic_val)
 
+            loop_start = time.perf_counter()
             for j, (original_idx, row_data) in enumerate(sorted_group.iterrows()):
                 art_key = (store, dep, disp, row_data[art])
                 fic_req = fict_req_dict.get(art_key, initial_req_fic_group.loc[original_idx])
@@ -86,10 +459,10 @@ def ficture_allocation(df, status_placeholder, col_map):
 
                 allocate = 0 
                 if i == 0:
-                    if mc_bal >= 1 and fic_req > 0.4:
+                    if mc_bal >= 1 and fic_req > min_requirement:
                         allocate = 1
                 elif i == 1:
-                    if mc_bal > fic_req and rest_per_group.loc[original_idx] >= 0.1:
+                    if mc_bal > fic_req and rest_per_group.loc[original_idx] >= min_rest_per:
                         allocate = int(np.round(fic_req))
                 elif i == 2:
                     if fic_req > 0 and mc_bal > 0:
@@ -103,6 +476,981 @@ def ficture_allocation(df, status_placeholder, col_map):
             
             fict_bal_dict[(store, dep, disp)] = mc_bal
 
-    df_1["Final"] = sum(df_1[f"Allocate_{i}"] for i in range(passes))
+            if profile is not None:
+                now = time.perf_counter()
+                profile.add('row loop', now - loop_start, i, len(group))
+                profile.add_group((store, dep, disp), len(group), now - group_start)
+
+        if profile is not None:
+            # Whatever the timed phases leave is the groupby and its iteration.
+            timed = sum(
+                entry['seconds'] for entry in profile.phases
+                if entry['pass'] == i and entry['phase'] in ('sort', 'rest_per', 'row loop')
+            )
+            profile.add('groupby', time.perf_counter() - pass_start - timed, i, len(df_1))
+
+    if tick is not None:
+        tick(passes - 1, len(fict_bal_dict), len(fict_bal_dict), force=True)
+
+    df_1["Final"] = sum(df_1[f"Allocate_{i}"] for i in range(PASSES))
     
     return df_1
+
+def _sort_desc(values):
+    """
+    Descending argsort of a 1-D array, NaNs last.
+
+    Mirrors what DataFrame.sort_values(ascending=False) does for a single
+    column (same quicksort call on the same reversed array), so tied rows
+    come out in exactly the order the reference implementation sees them.
+    """
+    mask = pd.isna(values)
+    idx = np.arange(len(values))
+    non_nans = values[~mask][::-1]
+    non_nan_idx = idx[~mask][::-1]
+    indexer = non_nan_idx[non_nans.argsort(kind="quicksort")][::-1]
+    return np.concatenate([indexer, np.nonzero(mask)[0]])
+
+def _as_array(series):
+    """Returns the values of a column as a NumPy array, NaN for missing."""
+    if isinstance(series.dtype, np.dtype):
+        return series.to_numpy()
+    return series.to_numpy(dtype=float, na_value=np.nan)
+
+def _narrow(values):
+    """
+    Returns `values` in the narrowest dtype that holds them exactly:
+    float32 for floats that survive the round trip, int32 for small ints.
+    """
+    if values.dtype == np.float64:
+        narrowed = values.astype(np.float32)
+        if np.array_equal(narrowed, values, equal_nan=True):
+            return narrowed
+    elif values.dtype.kind in "iu" and len(values):
+        if np.iinfo(np.int32).min <= values.min() and values.max() <= np.iinfo(np.int32).max:
+            return values.astype(np.int32)
+    return values
+
+def key_codes(values):
+    """Factorizes `values` into int64 codes, -1 for missing."""
+    codes, _ = pd.factorize(values)
+    return codes.astype(np.int64)
+
+def combine_codes(left, right):
+    """
+    Combines two code arrays from key_codes into codes of their pairs, -1 if
+    either is missing; e.g. store and department codes into codes of their
+    groups.
+    """
+    valid = (left >= 0) & (right >= 0)
+    combined = np.full(len(left), -1, dtype=np.int64)
+    combined[valid] = key_codes(left[valid] * (int(right.max(initial=-1)) + 1) + right[valid])
+    return combined
+
+def project(df, col_map):
+    """
+    Builds the compact working frame the array engine runs on: only the
+    mapped columns, with keys replaced by integer codes and numbers stored in
+    the narrowest exact dtype. Pass it to allocate_arrays.
+
+    Returns:
+        pd.DataFrame: Columns 'store', 'group' and 'art' (int32 codes, -1 when
+        missing) and 'mc_fic' and 'cont_per', aligned with the rows of `df`.
+    """
+    store = key_codes(df[col_map['store']])
+    group = combine_codes(combine_codes(store, key_codes(df[col_map['department']])), key_codes(df[col_map['udf']]))
+
+    # Like the reference's dict lookups, a missing text article matches the
+    # other missing articles of its group (the NaN singleton matches itself),
+    # while a missing numeric article never matches and keeps its own code.
+    art = df[col_map['art']]
+    art_codes, _ = pd.factorize(art, use_na_sentinel=pd.api.types.is_numeric_dtype(art))
+
+    return pd.DataFrame({
+        'store': store.astype(np.int32),
+        'group': group.astype(np.int32),
+        'art': art_codes.astype(np.int32),
+        'mc_fic': _narrow(_as_array(df[col_map['mc_fic']])),
+        'cont_per': _narrow(_as_array(df[col_map['cont_per']])),
+    })
+
+class _NumpyBackend:
+    """The NumPy implementation of the set-oriented stages; see ficture_polars for the other."""
+
+    @staticmethod
+    def group_rows(codes):
+        """Stable argsort of group codes."""
+        return np.argsort(codes, kind="stable")
+
+    @staticmethod
+    def sort_by_group(group_of, key):
+        """Positions sorted by group, then key descending with NaNs last, ties in input order."""
+        return np.lexsort((-key, group_of))
+
+    @staticmethod
+    def rest_per(offsets, cont, blocks):
+        """rest_per of rows in processing order, computed block by block; see _rest_per."""
+        rest = np.zeros(len(cont))
+        for first_group, end_group in blocks:
+            lo, hi = offsets[first_group], offsets[end_group]
+            block_offsets = (offsets[first_group:end_group + 1] - lo).tolist()
+            rest[lo:hi] = _rest_per(block_offsets, cont[lo:hi].tolist())
+        return rest
+
+    @staticmethod
+    def group_totals(group_of, values, n_groups):
+        """Sum of `values` per group, as float64 (bincount gives int64 for no rows)."""
+        return np.bincount(group_of, weights=values, minlength=n_groups).astype(np.float64, copy=False)
+
+def _backend():
+    """
+    Returns the implementation of the set-oriented stages selected by BACKEND.
+
+    Raises:
+        ValueError: For an unknown BACKEND.
+        ImportError: For BACKEND "polars" when polars is not installed.
+    """
+    if BACKEND not in BACKENDS:
+        raise ValueError(f"Unknown allocation backend: {BACKEND!r}. Expected one of {BACKENDS}.")
+    if BACKEND == "polars":
+        if importlib.util.find_spec('polars') is None:
+            raise ImportError("FICTURE_BACKEND=polars needs polars, which is not installed (pip install polars).")
+        import ficture_polars
+        return ficture_polars
+    return _NumpyBackend
+
+def _widen(values):
+    """Returns float32 values as float64 so arithmetic matches the reference."""
+    return values.astype(np.float64) if values.dtype == np.float32 else values
+
+class GroupIndex:
+    """
+    Rows grouped by (store, department, UDF), built once and shared by every
+    allocation pass.
+
+    Attributes:
+        codes (np.ndarray): Group number per row, -1 for rows with a missing
+            key (these are never allocated, as with groupby's dropna).
+        rows (np.ndarray): Row positions ordered by group, original order
+            within a group.
+        offsets (np.ndarray): Group boundaries; group g spans
+            offsets[g]:offsets[g+1] of any ordering returned by order().
+        first (np.ndarray): Position of the first row of each group.
+    """
+
+    def __init__(self, group_codes):
+        valid = group_codes >= 0
+        self.codes = np.full(len(group_codes), -1, dtype=np.int64)
+        self.codes[valid] = key_codes(group_codes[valid])
+        self.n_rows = len(group_codes)
+        self.n_groups = int(self.codes.max(initial=-1)) + 1
+
+        rows = _backend().group_rows(self.codes)
+        self.rows = rows[self.codes[rows] >= 0]
+        self.offsets = np.searchsorted(self.codes[self.rows], np.arange(self.n_groups + 1))
+        self.first = self.rows[self.offsets[:-1]]
+        self._orders = {}
+
+    def order(self, name, values=None):
+        """
+        Returns row positions grouped by group code and sorted by `values`
+        descending within each group, computed once per `name`.
+
+        `values=None` sorts on a constant key, which is what sorting on an
+        all-zero column amounts to.
+        """
+        if name not in self._orders:
+            self._orders[name] = self._sort(values)
+        return self._orders[name]
+
+    def blocks(self, rows_per_block):
+        """
+        Splits the groups into consecutive ranges of roughly
+        `rows_per_block` rows each.
+
+        Returns:
+            list: (first_group, end_group) pairs covering every group.
+        """
+        cuts = np.searchsorted(self.offsets, np.arange(0, len(self.rows), rows_per_block), side="right") - 1
+        cuts = np.unique(np.append(cuts, self.n_groups))
+        return list(zip(cuts[:-1].tolist(), cuts[1:].tolist()))
+
+    def _sort(self, values):
+        rows, offsets = self.rows, self.offsets
+        if values is None:
+            values = np.zeros(self.n_rows)
+        key = values[rows]
+        group_of = self.codes[rows]
+        sizes = np.diff(offsets)
+        starts = offsets[:-1]
+
+        # One global sort by (group, key descending). It only differs from
+        # the per-group quicksort the reference does where a group has tied
+        # keys, so those groups are re-sorted below.
+        fkey = key.astype(float)
+        pos = _backend().sort_by_group(group_of, fkey)
+        order = rows[pos]
+        sorted_key = fkey[pos]
+
+        same = (sorted_key[1:] == sorted_key[:-1]) | (
+            np.isnan(sorted_key[1:]) & np.isnan(sorted_key[:-1])
+        )
+        same &= group_of[1:] == group_of[:-1]
+        tied = np.zeros(self.n_groups, dtype=bool)
+        tied[group_of[1:][same]] = True
+        if not tied.any():
+            return order
+
+        # Groups whose key is constant sort the same way for a given size,
+        # so one permutation per size covers all of them.
+        nonempty = sizes > 0
+        lo = np.full(self.n_groups, np.nan)
+        hi = np.full(self.n_groups, np.nan)
+        lo[nonempty] = np.minimum.reduceat(fkey, starts[nonempty])
+        hi[nonempty] = np.maximum.reduceat(fkey, starts[nonempty])
+        constant = tied & (lo == hi)
+
+        for size in np.unique(sizes[constant]):
+            groups = np.nonzero(constant & (sizes == size))[0]
+            first = starts[groups[0]]
+            perm = _sort_desc(key[first:first + size])
+            span = starts[groups][:, None] + np.arange(size)
+            order[span] = rows[starts[groups][:, None] + perm]
+
+        for g in np.nonzero(tied & ~constant)[0]:
+            start, end = offsets[g], offsets[g + 1]
+            order[start:end] = rows[start:end][_sort_desc(key[start:end])]
+
+        return order
+
+def _rest_per(offsets, cont):
+    """
+    Share of CONT% left after each row of each group, i.e. the reverse
+    cumulative sum of CONT% shifted by one row, with missing values as 0.
+
+    Args:
+        offsets (list): Group boundaries; group g spans offsets[g]:offsets[g+1].
+        cont (list): CONT% per row, in processing order.
+
+    Returns:
+        list: rest_per aligned with the input rows.
+    """
+    rest = [0.0] * len(cont)
+    for g in range(len(offsets) - 1):
+        start, end = offsets[g], offsets[g + 1]
+        acc = None
+        nxt = 0.0
+        for k in range(end - 1, start - 1, -1):
+            rest[k] = nxt
+            value = cont[k]
+            if value != value:
+                nxt = 0.0
+            else:
+                acc = value if acc is None else acc + value
+                nxt = float(acc)
+    return rest
+
+def _run_pass(pass_no, offsets, init_req, slots, rest, mc_bal, req, min_requirement, min_rest_per, times=None):
+    """
+    Runs one allocation pass over rows already laid out in processing order.
+
+    Args:
+        pass_no (int): The pass being run (0, 1 or 2).
+        offsets (list): Group boundaries; group g spans offsets[g]:offsets[g+1].
+        init_req (list): Initial fixture requirement (CONT% * MC FIX) per row.
+        slots (list): Article slot per row, -1 when the article is missing.
+        rest (list): rest_per per row.
+        mc_bal (list): Remaining fixture balance per group, updated in place.
+        req (list): Remaining requirement per article slot (None until the
+            article is first seen), updated in place.
+        min_requirement, min_rest_per (float): Thresholds of passes 1 and 2,
+            see DEFAULT_RULES.
+        times (list, optional): When profiling, receives the perf_counter()
+            time at which each group finished.
+
+    Returns:
+        list: Allocation per row, aligned with the input rows.
+
+    Raises:
+        OverflowError: If an allocation is larger than ALLOCATION_MAX or
+            infinite.
+    """
+    alloc = [0] * len(init_req)
+
+    for g in range(len(offsets) - 1):
+        bal = mc_bal[g]
+        for k in range(offsets[g], offsets[g + 1]):
+            s = slots[k]
+            fic_req = req[s] if s >= 0 else None
+            if fic_req is None:
+                fic_req = init_req[k]
+
+            allocate = 0
+            if pass_no == 0:
+                if bal >= 1 and fic_req > min_requirement:
+                    allocate = 1
+            elif pass_no == 1:
+                if bal > fic_req and rest[k] >= min_rest_per:
+                    if not abs(fic_req) <= ALLOCATION_MAX:
+                        raise OverflowError(ALLOCATION_OVERFLOW)
+                    allocate = round(fic_req)
+            elif pass_no == 2:
+                if fic_req > 0 and bal > 0:
+                    if not bal <= ALLOCATION_MAX:
+                        raise OverflowError(ALLOCATION_OVERFLOW)
+                    allocate = round(bal)
+
+            bal = max(bal - allocate, 0)
+            if s >= 0:
+                req[s] = max(fic_req - allocate, 0)
+            alloc[k] = allocate
+
+        mc_bal[g] = bal
+        if times is not None:
+            times.append(time.perf_counter())
+
+    return alloc
+
+# Rows handed to the pass loop at a time; bounds the Python objects alive
+# while a pass runs.
+BLOCK_ROWS = 1 << 16
+
+class _Plan:
+    """
+    The part of an allocation that does not depend on the rules: the
+    GroupIndex, initial requirements and article slots per row, and each
+    pass ordering with its rest_per. Built once per working frame and
+    shared by every scenario of a sweep.
+
+    Attributes:
+        index (GroupIndex): The (store, department, UDF) groups.
+        blocks (list): Group ranges of about BLOCK_ROWS rows, see GroupIndex.blocks.
+        cont, init_req (np.ndarray): CONT% and CONT% * MC FIX per row.
+        slots (np.ndarray): Requirement slot per row, -1 without an article.
+        slot_bounds (np.ndarray): First slot of each group; numbered in group
+            order, so every block of groups owns a contiguous range of slots.
+        mc_fic (np.ndarray): MC FIX per group.
+    """
+
+    def __init__(self, work, profile=None):
+        n = len(work)
+        self.n_rows = n
+
+        with _phase(profile, 'group index', rows=n):
+            self.index = index = GroupIndex(work['group'].to_numpy())
+        self.blocks = index.blocks(BLOCK_ROWS)
+
+        self.cont = _widen(work['cont_per'].to_numpy())
+        mc = _widen(work['mc_fic'].to_numpy())
+        self.init_req = self.cont * mc
+        self.mc_fic = mc[index.first].astype(np.float64)
+
+        # One requirement slot per (group, article).
+        art = work['art'].to_numpy().astype(np.int64)
+        self.slots = np.full(n, -1, dtype=np.int64)
+        grouped = index.rows[art[index.rows] >= 0]
+        self.slots[grouped] = combine_codes(index.codes[grouped], art[grouped])
+        self.slot_bounds = np.maximum.accumulate(
+            np.append(-1, self.slots[index.rows])
+        )[index.offsets] + 1
+        self.n_slots = int(self.slots.max(initial=-1)) + 1
+
+        # Per-ordering rest_per, shared by passes that sort the same way.
+        self._rests = {}
+
+    def ordering(self, pass_no, profile=None):
+        """
+        Returns (order, rest) for a pass: the row positions in processing
+        order and rest_per aligned with them, computed once per ordering.
+        """
+        # Passes 1 and 2 order by CONT%; pass 3 orders by the previous pass's
+        # FIC_REQ column, which the reference never fills in (all zeros).
+        with _phase(profile, 'sort', pass_no, len(self.index.rows)):
+            if pass_no <= 1:
+                name = 'cont_per'
+                order = self.index.order(name, self.cont)
+            else:
+                name = f"FIC_REQ_{pass_no-1}"
+                order = self.index.order(name)
+
+        if name not in self._rests:
+            with _phase(profile, 'rest_per', pass_no, len(order)):
+                self._rests[name] = _backend().rest_per(self.index.offsets, self.cont[order], self.blocks)
+        return order, self._rests[name]
+
+def _compiled_pass():
+    """
+    Returns ficture_kernel.run_pass, or None when numba is installed but
+    cannot be imported (e.g. built against another NumPy version).
+    """
+    try:
+        from ficture_kernel import run_pass
+    except Exception:
+        return None
+    return run_pass
+
+def _run_passes(plan, rules=DEFAULT_RULES, tick=None, profile=None, checkpoint=None):
+    """
+    Runs the passes `rules` asks for over a _Plan.
+
+    Fixture balances and article requirements are tracked in flat per-group
+    and per-article arrays, and each pass produces its Allocate column in a
+    single assignment. Passes walk the groups in blocks of about BLOCK_ROWS
+    rows to keep memory flat, running each block through the KERNEL
+    implementation of the pass loop. The numba kernel does not time single
+    groups, so profiled runs use the Python loop. A bound Checkpoint is
+    resumed from and saved between blocks.
+
+    Returns:
+        tuple: (results, balances) where results holds "Allocate_0"..
+        "Allocate_2" (int32) and "rest_per" (float64) arrays aligned with the
+        working frame, and balances the fixtures left per group.
+    """
+    index = plan.index
+    offsets = index.offsets
+    n = plan.n_rows
+    min_requirement, min_rest_per = rules['min_requirement'], rules['min_rest_per']
+
+    if KERNEL not in KERNELS:
+        raise ValueError(f"Unknown allocation kernel: {KERNEL!r}. Expected one of {KERNELS}.")
+    run_pass = _compiled_pass() if KERNEL == "numba" and profile is None else None
+    compiled = run_pass is not None
+    if compiled:
+        seen = np.zeros(plan.n_slots, dtype=bool)
+
+    mc_bal = plan.mc_fic.copy()
+    req = np.zeros(plan.n_slots)
+
+    results = {f"Allocate_{i}": np.zeros(n, dtype=np.int32) for i in range(PASSES)}
+    group_seconds = np.zeros(index.n_groups) if profile is not None and not compiled else None
+
+    start_pass, start_group = 0, 0
+    state = checkpoint.load() if checkpoint is not None else None
+    if state is not None:
+        start_pass, start_group = state['pass_no'], state['next_group']
+        mc_bal, req = state['mc_bal'], state['req']
+        for i in range(PASSES):
+            results[f"Allocate_{i}"] = state['allocations'][i]
+        if compiled:
+            # Every article is seen in the first pass, so while it runs the
+            # seen ones are those of the groups before start_group.
+            seen[:] = True if start_pass > 0 else np.arange(plan.n_slots) < plan.slot_bounds[start_group]
+    every_groups = checkpoint.every_groups if checkpoint is not None else None
+
+    for i in range(start_pass, rules['passes']):
+        order, rest = plan.ordering(i, profile)
+
+        # Zeros for a fresh pass; the groups done so far when resuming one.
+        alloc = results[f"Allocate_{i}"][order]
+        saved_group = start_group if i == start_pass else 0
+        for first_group, end_group in plan.blocks:
+            if i == start_pass:
+                if end_group <= start_group:
+                    continue
+                first_group = max(first_group, start_group)
+            lo, hi = offsets[first_group], offsets[end_group]
+            if every_groups and first_group - saved_group >= every_groups:
+                results[f"Allocate_{i}"][order[:lo]] = alloc[:lo]
+                checkpoint.save(i, first_group, mc_bal, req, results)
+                saved_group = first_group
+            if tick is not None:
+                tick(i, first_group, index.n_groups)
+            rows = order[lo:hi]
+            s_lo, s_hi = plan.slot_bounds[first_group], plan.slot_bounds[end_group]
+
+            loop_start = time.perf_counter()
+            if compiled:
+                # The kernel updates these slices of the state arrays in place.
+                run_pass(
+                    i, offsets[first_group:end_group + 1] - lo, plan.init_req[rows], plan.slots[rows] - s_lo,
+                    rest[lo:hi], mc_bal[first_group:end_group], req[s_lo:s_hi], seen[s_lo:s_hi],
+                    min_requirement, min_rest_per, alloc[lo:hi]
+                )
+                if profile is not None:
+                    profile.add('row loop', time.perf_counter() - loop_start, i, hi - lo)
+                continue
+
+            block_offsets = (offsets[first_group:end_group + 1] - lo).tolist()
+            times = [] if profile is not None else None
+            block_slots = plan.slots[rows]
+            block_slots[block_slots >= 0] -= s_lo
+            # Every article is seen in the first pass, so later passes always
+            # start from the stored requirement.
+            block_req = [None] * (s_hi - s_lo) if i == 0 else req[s_lo:s_hi].tolist()
+            block_bal = mc_bal[first_group:end_group].tolist()
+
+            run_start = time.perf_counter()
+            alloc[lo:hi] = _run_pass(
+                i, block_offsets, plan.init_req[rows].tolist(), block_slots.tolist(),
+                rest[lo:hi].tolist(), block_bal, block_req, min_requirement, min_rest_per, times
+            )
+
+            req[s_lo:s_hi] = block_req
+            mc_bal[first_group:end_group] = block_bal
+
+            if profile is not None:
+                profile.add('row loop', time.perf_counter() - loop_start, i, hi - lo)
+                group_seconds[first_group:end_group] += np.diff(times, prepend=run_start)
+
+        results[f"Allocate_{i}"][order] = alloc
+        if checkpoint is not None and i + 1 < rules['passes']:
+            checkpoint.save(i + 1, 0, mc_bal, req, results)
+
+    # rest_per as left by the last pass, like the reference's column.
+    results['rest_per'] = np.zeros(n)
+    results['rest_per'][order] = rest
+
+    if checkpoint is not None:
+        checkpoint.remove()
+
+    if group_seconds is not None:
+        profile.add_groups(index.first, np.diff(offsets), group_seconds)
+    if tick is not None:
+        tick(rules['passes'] - 1, index.n_groups, index.n_groups, force=True)
+
+    return results, mc_bal
+
+def allocate_arrays(work, tick=None, profile=None, rules=DEFAULT_RULES, checkpoint=None):
+    """
+    Array-based core of the fixture allocation: builds a _Plan of `work`
+    and runs the passes over it. Unlike allocate, it takes the projected
+    frame and returns bare arrays, for callers that feed it part of the data
+    at a time (see ficture_stream); assemble_result joins them onto the rows.
+
+    Args:
+        work (pd.DataFrame): Compact working frame built by project.
+        tick (_ProgressReporter, optional): Receives progress within each pass.
+        profile (Profile, optional): Receives phase and per-group timings.
+        rules (dict): Resolved allocation rules, see resolve_rules.
+        checkpoint (Checkpoint, optional): Snapshot file of this run.
+
+    Returns:
+        dict: "Allocate_0".."Allocate_2" (int32) and "rest_per" (float64)
+        arrays aligned with `work`.
+    """
+    if checkpoint is not None:
+        checkpoint.bind(work, rules)
+    return _run_passes(_Plan(work, profile), rules, tick, profile, checkpoint)[0]
+
+def assemble_result(df, results, compact=False):
+    """
+    Joins the allocation results onto the rows of `df`.
+
+    By default the columns match the reference output (float64 allocations
+    plus the MC_BAl_i / FIC_REQ_i columns, which the allocation never fills
+    in). compact=True keeps int32 allocations and leaves those columns out.
+    """
+    n = len(df)
+    df_1 = df.copy(deep=False)
+    for i in range(PASSES):
+        if compact:
+            df_1[f"Allocate_{i}"] = results[f"Allocate_{i}"]
+        else:
+            df_1[f"Allocate_{i}"] = results[f"Allocate_{i}"].astype(np.float64)
+            df_1[f"MC_BAl_{i}"] = np.zeros(n)
+            df_1[f"FIC_REQ_{i}"] = np.zeros(n)
+
+    df_1['rest_per'] = results['rest_per']
+    df_1["Final"] = sum(df_1[f"Allocate_{i}"] for i in range(PASSES))
+
+    return df_1
+
+def allocation_cube(result_df, col_map):
+    """
+    Aggregates an allocation result per (store, department, UDF) group, for
+    charts and drill-downs that should not scan the row-level result.
+
+    The fixtures left in each group and the requirement left of each article
+    are replayed from the allocations of every pass, in the order the passes
+    processed the rows, see _left_after.
+
+    Args:
+        result_df (pd.DataFrame): Output of allocate (either layout).
+        col_map (dict): The column mapping it was allocated with.
+
+    Returns:
+        pd.DataFrame: One row per group with the three key columns and
+        'rows', 'articles', 'mc_fic' (fixtures available), 'requirement'
+        (initial fixture requirement), 'Allocate_0'..'Allocate_2', 'Final',
+        'balance' (fixtures left) and 'unmet_requirement'.
+    """
+    work = project(result_df, col_map)
+    index = GroupIndex(work['group'].to_numpy())
+    n_groups = index.n_groups
+    rows = index.rows
+    group_of = index.codes[rows]
+
+    cont = _widen(work['cont_per'].to_numpy())
+    mc = _widen(work['mc_fic'].to_numpy())
+    init_req = cont * mc
+
+    # Allocations are whole numbers, so their totals do not depend on the
+    # order the backend adds them in.
+    backend = _backend()
+    totals = {}
+    for name in [f"Allocate_{i}" for i in range(PASSES)] + ['Final']:
+        totals[name] = backend.group_totals(
+            group_of, result_df[name].to_numpy(dtype=np.float64)[rows], n_groups
+        )
+
+    # Requirement slots as in the engine; rows without an article keep
+    # their own. A slot starts from its first row in pass 1 order.
+    art = work['art'].to_numpy().astype(np.int64)
+    slots = np.full(len(work), -1, dtype=np.int64)
+    grouped = rows[art[rows] >= 0]
+    slots[grouped] = combine_codes(index.codes[grouped], art[grouped])
+    own = rows[slots[rows] < 0]
+    slots[own] = int(slots.max(initial=-1)) + 1 + np.arange(len(own))
+
+    order = index.order('cont_per', cont)
+    slot_ids, first = np.unique(slots[order], return_index=True)
+    slot_group = index.codes[order[first]]
+    slot_req = init_req[order[first]]
+
+    # Every row as each pass saw it, in processing order: passes 1 and 2 by
+    # CONT%, pass 3 by the all-zero FIC_REQ column.
+    pass_orders = [order, order, index.order('FIC_REQ_1')]
+    seq_rows = np.concatenate(pass_orders)
+    seq_alloc = np.concatenate([
+        result_df[f"Allocate_{i}"].to_numpy(dtype=np.float64)[pass_order]
+        for i, pass_order in enumerate(pass_orders)
+    ])
+    slot_left = _left_after(slot_req, np.searchsorted(slot_ids, slots[seq_rows]), seq_alloc)
+    known = ~np.isnan(slot_req)
+    requirement = np.bincount(slot_group[known], weights=slot_req[known], minlength=n_groups)
+    unmet = np.bincount(slot_group[known], weights=slot_left[known], minlength=n_groups)
+
+    keys = [col_map['store'], col_map['department'], col_map['udf']]
+    cube = result_df[keys].iloc[index.first].reset_index(drop=True)
+    cube['rows'] = np.diff(index.offsets)
+    cube['articles'] = np.bincount(slot_group, minlength=n_groups)
+    cube['mc_fic'] = mc[index.first]
+    cube['requirement'] = requirement
+    for name, values in totals.items():
+        cube[name] = values
+    cube['balance'] = _left_after(mc[index.first].astype(np.float64), index.codes[seq_rows], seq_alloc)
+    cube['unmet_requirement'] = unmet
+    return cube
+
+def _left_after(start, keys, steps):
+    """
+    Returns what is left of start[key] for every key once `steps` are taken
+    off one after the other, each as max(left - step, 0) like the passes do.
+
+    With S the running total of a key's steps, that is max(start, max(S)) - S
+    at the end, so negative allocations (from negative CONT% or MC FIX) are
+    replayed exactly too. NaN starts stay NaN.
+
+    Args:
+        start (np.ndarray): Starting value per key.
+        keys (np.ndarray): Key of each step, in [0, len(start)).
+        steps (np.ndarray): Amounts taken off, in order.
+    """
+    spent = pd.Series(steps).groupby(keys, sort=False).cumsum().to_numpy()
+    peak = np.full(len(start), -np.inf)
+    np.maximum.at(peak, keys, spent)
+    return np.maximum(start, peak) - np.bincount(keys, weights=steps, minlength=len(start))
+
+def _shard_by_store(store_codes, n_shards):
+    """
+    Splits row positions into at most `n_shards` shards of whole stores,
+    balanced by row count (largest stores placed first).
+
+    Returns:
+        list: Sorted row-position arrays, one per non-empty shard.
+    """
+    valid = store_codes >= 0
+    sizes = np.bincount(store_codes[valid])
+
+    shard_of_store = np.empty(len(sizes), dtype=np.int64)
+    load = np.zeros(n_shards, dtype=np.int64)
+    for store in np.argsort(sizes, kind="stable")[::-1]:
+        shard = int(load.argmin())
+        shard_of_store[store] = shard
+        load[shard] += sizes[store]
+
+    # Rows with a missing store are never allocated; they need no shard.
+    shard_of_row = np.full(len(store_codes), -1, dtype=np.int64)
+    shard_of_row[valid] = shard_of_store[store_codes[valid]]
+    rows = np.argsort(shard_of_row, kind="stable")
+    bounds = np.searchsorted(shard_of_row[rows], np.arange(n_shards + 1))
+    return [rows[lo:hi] for lo, hi in zip(bounds[:-1], bounds[1:]) if hi > lo]
+
+def _allocate_shard(shard, profiled=False, rules=DEFAULT_RULES):
+    """
+    Worker entry point: allocates one shard of the working frame.
+
+    Returns:
+        tuple: (result arrays, number of groups in the shard, Profile of the
+        shard or None).
+    """
+    profile = Profile() if profiled else None
+    groups = shard['group'].to_numpy()
+    return allocate_arrays(shard, profile=profile, rules=rules), len(np.unique(groups[groups >= 0])), profile
+
+def _allocate_parallel(work, workers, tick=None, profile=None, rules=DEFAULT_RULES):
+    """
+    Runs the array engine across a process pool, one shard of whole stores
+    per task. Groups never span stores, so every shard allocates exactly as
+    it would in the full frame; results are scattered back by row position.
+    """
+    n = len(work)
+
+    # A few shards per worker keeps the pool busy when store sizes vary.
+    shards = _shard_by_store(work['store'].to_numpy(), workers * 4)
+    groups_total = int(work['group'].max()) + 1 if n else 0
+    groups_done = 0
+
+    results = {f"Allocate_{i}": np.zeros(n, dtype=np.int32) for i in range(PASSES)}
+    results['rest_per'] = np.zeros(n)
+
+    context = multiprocessing.get_context("spawn")
+    with concurrent.futures.ProcessPoolExecutor(max_workers=workers, mp_context=context) as pool:
+        futures = {
+            pool.submit(_allocate_shard, work.iloc[rows].reset_index(drop=True), profile is not None, rules): rows
+            for rows in shards
+        }
+        try:
+            for done, future in enumerate(concurrent.futures.as_completed(futures), start=1):
+                rows = futures[future]
+                shard_results, shard_groups, shard_profile = future.result()
+                for name, values in shard_results.items():
+                    results[name][rows] = values
+                if shard_profile is not None:
+                    profile.merge(shard_profile, rows)
+
+                groups_done += shard_groups
+                if tick is not None:
+                    tick(None, groups_done, groups_total, force=done == len(futures))
+        except BaseException:
+            # Don't start the remaining shards when a shard fails or the
+            # progress callback stops the run.
+            pool.shutdown(cancel_futures=True)
+            raise
+
+    return results
+
+class AllocationState:
+    """
+    What an incremental run needs from the previous one: a fingerprint of
+    every group's input rows and that group's results, in group row order.
+
+    Attributes:
+        col_map (dict): Column mapping the state was built with.
+        art_numeric (bool): Whether the article column was numeric, which
+            changes how missing articles are matched.
+        rules (dict): Allocation rules the results were computed with.
+        version (int): ALLOCATION_VERSION the results were computed with.
+        groups (dict): Group fingerprint -> (start, size) in the arrays below.
+        allocations (np.ndarray): int32 array of shape (PASSES, rows).
+        rest_per (np.ndarray): float64 rest_per per row.
+    """
+
+    def __init__(self, col_map, art_numeric, groups, allocations, rest_per, rules=DEFAULT_RULES):
+        self.col_map = dict(col_map)
+        self.art_numeric = art_numeric
+        self.rules = dict(rules)
+        self.version = ALLOCATION_VERSION
+        self.groups = groups
+        self.allocations = allocations
+        self.rest_per = rest_per
+
+    def matches(self, col_map, art_numeric, rules=DEFAULT_RULES):
+        """Whether results in this state can be reused for a run with these settings."""
+        return (
+            self.col_map == col_map
+            and self.art_numeric == art_numeric
+            and getattr(self, 'rules', DEFAULT_RULES) == rules
+            and self.version == ALLOCATION_VERSION
+        )
+
+def _group_fingerprints(df, col_map, index):
+    """
+    Fingerprints the input rows of every group: a 128-bit, order-sensitive
+    combination of the row hashes of the mapped columns, plus the group size.
+
+    Returns:
+        list: One (hash_a, hash_b, size) tuple per group of `index`.
+    """
+    columns = list(dict.fromkeys(col_map[key] for key in (
+        'store', 'department', 'udf', 'mc_fic', 'cont_per', 'art'
+    )))
+    row_hash = pd.util.hash_pandas_object(df[columns], index=False).to_numpy()[index.rows]
+
+    sizes = np.diff(index.offsets)
+    starts = index.offsets[:-1]
+    if not len(starts):
+        return []
+
+    # Weighting each row by its position keeps reordered groups distinct. The
+    # weights are forced odd: position 0 hashes to 0, which would drop the row.
+    position = (np.arange(len(index.rows)) - np.repeat(starts, sizes)).astype(np.uint64)
+    weight_a = pd.util.hash_array(position) | np.uint64(1)
+    weight_b = pd.util.hash_array(position, hash_key='ficture-alloc-02') | np.uint64(1)
+    hash_a = np.add.reduceat(row_hash * weight_a, starts)
+    hash_b = np.add.reduceat(row_hash * weight_b, starts)
+    return list(zip(hash_a.tolist(), hash_b.tolist(), sizes.tolist()))
+
+def allocate_incremental(df, col_map, previous=None, workers=1, progress=None,
+                         progress_interval_ms=250, compact=False, profile=None, rules=None, checkpoint=None):
+    """
+    Performs the fixture allocation with the numpy engine, recomputing only
+    the (store, department, UDF) groups whose input rows changed since the
+    run that produced `previous`; the other groups reuse its results.
+
+    Args:
+        df (pd.DataFrame): The input DataFrame.
+        col_map (dict): A dictionary mapping generic column names to user-defined names.
+        previous (AllocationState, optional): State returned by an earlier
+            call. Without it (or if the mapping or rules changed) every
+            group is computed.
+        workers, progress, progress_interval_ms, compact, profile, rules,
+            checkpoint: As for allocate; progress, the pass timings and the
+            checkpoint cover only the recomputed groups.
+
+    Returns:
+        tuple: (result DataFrame, AllocationState for the next run, report
+        dict with 'groups_reused', 'groups_recomputed' and 'rows_recomputed').
+    """
+    rules = resolve_rules(rules)
+    if checkpoint is not None and workers != 1:
+        raise ValueError("Checkpoints need workers=1.")
+    tick = _ProgressReporter(progress, progress_interval_ms) if progress is not None else None
+    start = time.perf_counter()
+    if workers is None:
+        workers = os.cpu_count() or 1
+
+    n = len(df)
+    with _phase(profile, 'project', rows=n):
+        work = project(df, col_map)
+    with _phase(profile, 'fingerprint', rows=n):
+        index = GroupIndex(work['group'].to_numpy())
+        fingerprints = _group_fingerprints(df, col_map, index)
+    art_numeric = pd.api.types.is_numeric_dtype(df[col_map['art']])
+
+    if previous is None or not previous.matches(col_map, art_numeric, rules):
+        previous = None
+
+    results = {f"Allocate_{i}": np.zeros(n, dtype=np.int32) for i in range(PASSES)}
+    results['rest_per'] = np.zeros(n)
+
+    changed = np.ones(index.n_groups, dtype=bool)
+    if previous is not None:
+        for g, fingerprint in enumerate(fingerprints):
+            found = previous.groups.get(fingerprint)
+            if found is None:
+                continue
+            start, size = found
+            rows = index.rows[index.offsets[g]:index.offsets[g + 1]]
+            for i in range(PASSES):
+                results[f"Allocate_{i}"][rows] = previous.allocations[i, start:start + size]
+            results['rest_per'][rows] = previous.rest_per[start:start + size]
+            changed[g] = False
+
+    # Groups are independent, so allocating just the changed ones as a frame
+    # of their own gives the same result as a full run.
+    recompute = np.sort(index.rows[np.repeat(changed, np.diff(index.offsets))])
+    if len(recompute):
+        subset = work.iloc[recompute].reset_index(drop=True)
+        partial_profile = Profile() if profile is not None else None
+        if workers > 1:
+            partial = _allocate_parallel(subset, workers, tick, partial_profile, rules)
+        else:
+            partial = allocate_arrays(subset, tick, partial_profile, rules, checkpoint)
+        for name, values in partial.items():
+            results[name][recompute] = values
+        if profile is not None:
+            profile.merge(partial_profile, recompute)
+
+    state = AllocationState(
+        col_map,
+        art_numeric,
+        {fingerprint: (int(index.offsets[g]), fingerprint[2]) for g, fingerprint in enumerate(fingerprints)},
+        np.stack([results[f"Allocate_{i}"][index.rows] for i in range(PASSES)]),
+        results['rest_per'][index.rows],
+        rules,
+    )
+    report = {
+        'groups_reused': int(index.n_groups - changed.sum()),
+        'groups_recomputed': int(changed.sum()),
+        'rows_recomputed': int(len(recompute)),
+    }
+
+    with _phase(profile, 'assemble', rows=n):
+        df_1 = assemble_result(df, results, compact)
+    if profile is not None:
+        profile.finish(df, col_map, time.perf_counter() - start)
+    return df_1, state, report
+
+def rule_grid(**values):
+    """
+    Returns every combination of the given rule values as a list of rules,
+    e.g. rule_grid(passes=[2, 3], min_requirement=[0.3, 0.4]) gives four.
+    """
+    names = list(values)
+    return [dict(zip(names, combination)) for combination in itertools.product(*values.values())]
+
+def _sweep_totals(plan, scenarios):
+    """
+    Worker entry point: runs each scenario's rules over `plan`.
+
+    Returns:
+        list: One dict of totals per scenario, see allocate_sweep.
+    """
+    totals = []
+    for rules in scenarios:
+        start = time.perf_counter()
+        results, balances = _run_passes(plan, rules)
+        final = sum(results[f"Allocate_{i}"].astype(np.int64) for i in range(PASSES))
+        total = {f"Allocate_{i}": int(results[f"Allocate_{i}"].sum(dtype=np.int64)) for i in range(PASSES)}
+        total['Final'] = int(final.sum())
+        total['balance'] = float(np.nansum(balances))
+        total['rows_allocated'] = int(np.count_nonzero(final))
+        total['seconds'] = time.perf_counter() - start
+        totals.append(total)
+    return totals
+
+def allocate_sweep(df, col_map, scenarios, workers=1):
+    """
+    Allocates `df` under several sets of allocation rules and compares their
+    totals. The projection, grouping, sort orders and rest_per do not depend
+    on the rules, so they are computed once and shared by every scenario;
+    only the passes themselves run per scenario.
+
+    Args:
+        df (pd.DataFrame): The input DataFrame.
+        col_map (dict): A dictionary mapping generic column names to user-defined names.
+        scenarios (list): Rules dicts (see DEFAULT_RULES, and rule_grid for
+            building a grid); rules a scenario leaves out keep their default.
+        workers (int, optional): Worker processes the scenarios are spread
+            over when greater than 1; None uses every CPU.
+
+    Returns:
+        pd.DataFrame: One row per scenario, in order, with its rules and the
+        totals 'Allocate_0'..'Allocate_2', 'Final', 'balance' (fixtures left
+        unallocated), 'rows_allocated' (rows given at least one fixture) and
+        the 'seconds' its passes took.
+    """
+    scenarios = [resolve_rules(rules) for rules in scenarios]
+    if workers is None:
+        workers = os.cpu_count() or 1
+    workers = min(workers, len(scenarios))
+
+    plan = _Plan(project(df, col_map))
+    # Order every pass up front, so the workers receive the orderings ready-made.
+    for i in range(max((rules['passes'] for rules in scenarios), default=0)):
+        plan.ordering(i)
+
+    if workers > 1:
+        totals = [None] * len(scenarios)
+        context = multiprocessing.get_context("spawn")
+        with concurrent.futures.ProcessPoolExecutor(max_workers=workers, mp_context=context) as pool:
+            futures = {
+                pool.submit(_sweep_totals, plan, scenarios[w::workers]): w for w in range(workers)
+            }
+            for future in concurrent.futures.as_completed(futures):
+                totals[futures[future]::workers] = future.result()
+    else:
+        totals = _sweep_totals(plan, scenarios)
+
+    return pd.DataFrame([{**rules, **total} for rules, total in zip(scenarios, totals)])
@@ -0,0 +1,317 @@
+"""
+Bounded-memory allocation for inputs larger than RAM.
+
+The input is read in chunks and only the mapped columns are spilled to
+on-disk buckets by store. Buckets are allocated a few at a time, since
+stores never share a group, and the results land in memory-mapped arrays.
+A final pass re-reads the input and writes it out with the result columns,
+in input order. Memory use follows `memory_mb`; disk use is about the
+size of the mapped columns plus the output.
+"""
+import itertools
+import os
+import tempfile
+
+import numpy as np
+import pandas as pd
+
+from ficture_io import COMPRESSION, file_format, mapped_columns
+from ficture_processing import PASSES, allocate_arrays, assemble_result, project
+from ficture_validate import coerce_numeric
+
+# Formats the streaming writer can append to.
+STREAM_OUTPUT_FORMATS = ('csv', 'parquet', 'feather')
+
+# Default memory ceiling in MB.
+MEMORY_MB = 1024
+
+# Store buckets the mapped columns are spilled into. Several small buckets
+# are allocated together; a bucket larger than the ceiling is allocated alone.
+BUCKETS = 256
+
+# Rows read to estimate the size of a row in memory.
+PROBE_ROWS = 10_000
+
+# A chunk of input may use 1/CHUNK_SHARE of the memory ceiling ...
+CHUNK_SHARE = 4
+# ... and allocating a row takes about WORK_FACTOR times its spilled size
+# (codes, sort orders, per-block lists and the results).
+WORK_FACTOR = 8
+
+ROW_COLUMN = '__row'
+
+def iter_chunks(path, chunk_rows, columns=None, sheet=None, text_columns=()):
+    """
+    Yields the rows of a file as DataFrames of at most `chunk_rows` rows.
+
+    CSV and Parquet are read incrementally and .xlsx through openpyxl's
+    read-only mode. Feather files are read one record batch at a time, so a
+    file written as a single batch is loaded whole, as are .xls files.
+
+    `text_columns` of CSV and Excel files are read as text, so their values
+    do not depend on what else a chunk holds; Parquet and Feather columns
+    have one type for the whole file.
+
+    Raises:
+        ValueError: If the format cannot be read.
+    """
+    fmt = file_format(path)
+    if fmt == 'csv':
+        dtype = {col: str for col in text_columns}
+        with pd.read_csv(path, usecols=columns, chunksize=chunk_rows, dtype=dtype or None) as reader:
+            yield from reader
+    elif fmt == 'parquet':
+        import pyarrow.parquet as pq
+        for batch in pq.ParquetFile(path).iter_batches(batch_size=chunk_rows, columns=columns):
+            yield batch.to_pandas()
+    elif fmt == 'feather':
+        import pyarrow as pa
+        import pyarrow.ipc as ipc
+        with pa.memory_map(path) as source:
+            reader = ipc.open_file(source)
+            for i in range(reader.num_record_batches):
+                df = reader.get_batch(i).to_pandas()
+                yield df if columns is None else df[columns]
+    elif fmt == 'xlsx':
+        import openpyxl
+        book = openpyxl.load_workbook(path, read_only=True, data_only=True)
+        try:
+            sheet_ = book[sheet] if sheet else book.worksheets[0]
+            rows = sheet_.iter_rows(values_only=True)
+            header = list(next(rows, ()))
+            for batch in iter(lambda: list(itertools.islice(rows, chunk_rows)), []):
+                df = pd.DataFrame(batch, columns=header).infer_objects()
+                for col in text_columns:
+                    df[col] = df[col].astype(str).where(df[col].notna())
+                yield df if columns is None else df[columns]
+        finally:
+            book.close()
+    elif fmt == 'xls':
+        dtype = {col: str for col in text_columns}
+        df = pd.read_excel(path, sheet_name=sheet or 0, usecols=columns, dtype=dtype or None)
+        for start in range(0, len(df), chunk_rows):
+            yield df.iloc[start:start + chunk_rows]
+    else:
+        raise ValueError(f"Unsupported file format: {path}. Expected csv, xlsx, xls, parquet or feather.")
+
+def _key_text(values):
+    """
+    Returns key values as text, missing values as NaN. Numbers are formatted
+    as floats so a chunk read as int and one read as float agree.
+    """
+    if pd.api.types.is_numeric_dtype(values) and not pd.api.types.is_bool_dtype(values):
+        values = values.astype('float64')
+    return values.astype(str).where(values.notna())
+
+def _all_numbers(values):
+    """Whether every value of a key column that is present is a number, or text of one."""
+    if pd.api.types.is_numeric_dtype(values) and not pd.api.types.is_bool_dtype(values):
+        return True
+    present = values.dropna()
+    return bool(pd.to_numeric(present, errors='coerce').notna().all())
+
+def _bucket_key(values):
+    """
+    Returns key text with numbers in one form ('1001' and '1001.0' both as
+    '1001.0'), so values a full read would take as equal share a bucket.
+    """
+    numbers = pd.to_numeric(values, errors='coerce').astype('float64')
+    return values.where(numbers.isna(), numbers.astype(str))
+
+def _spill_frame(chunk, col_map, first_row):
+    """Returns the mapped columns of a chunk in the fixed spill layout."""
+    keys = {col_map[key] for key in ('store', 'department', 'udf', 'art')}
+    spill = pd.DataFrame({ROW_COLUMN: np.arange(first_row, first_row + len(chunk), dtype=np.int64)})
+    for col in mapped_columns(col_map):
+        values = chunk[col].reset_index(drop=True)
+        if col in keys:
+            spill[col] = _key_text(values)
+        else:
+            numbers, bad = coerce_numeric(values)
+            if bad.any():
+                row = first_row + int(np.flatnonzero(bad)[0]) + 1
+                raise ValueError(f"{bad.sum():,} values in '{col}' are not numbers, the first in row {row:,}")
+            spill[col] = numbers.to_numpy()
+    return spill
+
+def _spill_schema(col_map):
+    """Returns the Arrow schema of the spilled buckets."""
+    import pyarrow as pa
+    keys = {col_map[key] for key in ('store', 'department', 'udf', 'art')}
+    fields = [pa.field(ROW_COLUMN, pa.int64())]
+    fields += [pa.field(col, pa.string() if col in keys else pa.float64()) for col in mapped_columns(col_map)]
+    return pa.schema(fields)
+
+def _plan_partitions(bucket_rows, partition_rows):
+    """Groups bucket numbers into partitions of at most `partition_rows` rows (or one bucket)."""
+    partitions, current, size = [], [], 0
+    for bucket, rows in enumerate(bucket_rows):
+        if not rows:
+            continue
+        if current and size + rows > partition_rows:
+            partitions.append(current)
+            current, size = [], 0
+        current.append(bucket)
+        size += rows
+    if current:
+        partitions.append(current)
+    return partitions
+
+class _TableWriter:
+    """Appends DataFrames to a CSV, Parquet or Feather file; later chunks take the first chunk's schema."""
+
+    def __init__(self, path, fmt):
+        if fmt not in STREAM_OUTPUT_FORMATS:
+            raise ValueError(f"Unsupported streaming output format: {path}. Expected one of {STREAM_OUTPUT_FORMATS}.")
+        self.path = path
+        self.fmt = fmt
+        self.writer = None
+        self.schema = None
+
+    def write(self, df):
+        if self.fmt == 'csv':
+            df.to_csv(self.path, mode='w' if self.writer is None else 'a', header=self.writer is None, index=False)
+            self.writer = True
+            return
+
+        import pyarrow as pa
+        if self.writer is None:
+            table = pa.Table.from_pandas(df, preserve_index=False)
+            self.schema = table.schema
+            if self.fmt == 'parquet':
+                import pyarrow.parquet as pq
+                self.writer = pq.ParquetWriter(self.path, self.schema, compression=COMPRESSION)
+            else:
+                import pyarrow.ipc as ipc
+                self.writer = ipc.new_file(
+                    self.path, self.schema, options=ipc.IpcWriteOptions(compression=COMPRESSION)
+                )
+        else:
+            try:
+                table = pa.Table.from_pandas(df, schema=self.schema, preserve_index=False)
+            except (pa.ArrowInvalid, pa.ArrowTypeError) as e:
+                raise ValueError(
+                    f"Column types change between chunks of the input ({e}); write CSV output instead."
+                ) from e
+        self.writer.write_table(table)
+
+    def close(self):
+        if self.writer is not None and self.writer is not True:
+            self.writer.close()
+
+def allocate_stream(input_path, output_path, col_map, memory_mb=MEMORY_MB, sheet=None, compact=False,
+                    mapped_only=False, buckets=BUCKETS, workdir=None):
+    """
+    Performs the fixture allocation of a file of any size within a memory
+    ceiling and writes the result to `output_path`, in input order.
+
+    Args:
+        input_path (str): CSV, Excel, Parquet or Feather input.
+        output_path (str): CSV, Parquet or Feather output, by extension.
+        col_map (dict): A dictionary mapping generic column names to user-defined names.
+        memory_mb (int): Memory ceiling for the chunks and partitions. A
+            single store larger than the ceiling is still allocated whole.
+        sheet (str, optional): Excel sheet; defaults to the first one.
+        compact (bool): As for allocate.
+        mapped_only (bool): Read and write only the mapped columns.
+        buckets (int): Number of on-disk store buckets.
+        workdir (str, optional): Directory for the spilled data; defaults
+            to the system temporary directory.
+
+    Returns:
+        dict: Row count, partition count and the chunk and partition sizes in rows.
+
+    Raises:
+        ValueError: If a format is unsupported, or MC FIX / CONT% is not numeric.
+    """
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    columns = mapped_columns(col_map) if mapped_only else None
+    writer = _TableWriter(output_path, file_format(output_path))
+    memory_bytes = memory_mb * 1024 * 1024
+
+    # Size chunks and partitions from a sample of the input.
+    probe = next(iter_chunks(input_path, PROBE_ROWS, columns, sheet), None)
+    if probe is None or not len(probe):
+        writer.write(assemble_result(probe if probe is not None else pd.DataFrame(columns=columns), {
+            **{f"Allocate_{i}": np.zeros(0, dtype=np.int32) for i in range(PASSES)},
+            'rest_per': np.zeros(0),
+        }, compact))
+        writer.close()
+        return {'rows': 0, 'partitions': 0, 'chunk_rows': 0, 'partition_rows': 0}
+    row_bytes = probe.memory_usage(deep=True).sum() / len(probe)
+    spill_bytes = _spill_frame(probe, col_map, 0).memory_usage(deep=True).sum() / len(probe)
+    chunk_rows = max(PROBE_ROWS, int(memory_bytes / (CHUNK_SHARE * row_bytes)))
+    partition_rows = max(PROBE_ROWS, int(memory_bytes / (WORK_FACTOR * spill_bytes)))
+    del probe
+
+    with tempfile.TemporaryDirectory(prefix='ficture_stream_', dir=workdir) as tmp:
+        # 1. Spill the mapped columns into store buckets.
+        schema = _spill_schema(col_map)
+        writers = [None] * buckets
+        bucket_rows = [0] * buckets
+        # Key columns are read as text; those holding only numbers in the
+        # whole file are turned back into numbers before allocating, as a
+        # full read would type them.
+        keys = {col_map[key] for key in ('store', 'department', 'udf', 'art')}
+        numeric = dict.fromkeys(keys, True)
+        n = 0
+        try:
+            for chunk in iter_chunks(input_path, chunk_rows, mapped_columns(col_map), sheet, keys):
+                for col in keys:
+                    numeric[col] = numeric[col] and _all_numbers(chunk[col])
+                spill = _spill_frame(chunk, col_map, n)
+                n += len(chunk)
+                store_key = _bucket_key(spill[col_map['store']]).to_numpy(dtype=object)
+                bucket = pd.util.hash_array(store_key) % np.uint64(buckets)
+                for b, rows in pd.Series(np.arange(len(spill))).groupby(bucket).groups.items():
+                    if writers[b] is None:
+                        writers[b] = pq.ParquetWriter(os.path.join(tmp, f"bucket_{b}.parquet"), schema)
+                    writers[b].write_table(pa.Table.from_pandas(spill.iloc[rows], schema=schema, preserve_index=False))
+                    bucket_rows[b] += len(rows)
+        finally:
+            for w in writers:
+                if w is not None:
+                    w.close()
+
+        # 2. Allocate partitions of whole buckets into memory-mapped results.
+        allocations = np.lib.format.open_memmap(
+            os.path.join(tmp, 'allocations.npy'), mode='w+', dtype=np.int32, shape=(PASSES, max(n, 1))
+        )
+        rest_per = np.lib.format.open_memmap(
+            os.path.join(tmp, 'rest_per.npy'), mode='w+', dtype=np.float64, shape=(max(n, 1),)
+        )
+        partitions = _plan_partitions(bucket_rows, partition_rows)
+        for partition in partitions:
+            part = pa.concat_tables([
+                pq.read_table(os.path.join(tmp, f"bucket_{b}.parquet")) for b in partition
+            ]).to_pandas()
+            for col in keys:
+                if numeric[col]:
+                    # Equal numbers written differently become one key, and
+                    # missing numeric articles keep their own requirement,
+                    # as in a full run.
+                    part[col] = pd.to_numeric(part[col])
+            rows = part[ROW_COLUMN].to_numpy()
+            results = allocate_arrays(project(part, col_map))
+            for i in range(PASSES):
+                allocations[i, rows] = results[f"Allocate_{i}"]
+            rest_per[rows] = results['rest_per']
+            del part, results
+
+        # 3. Re-read the input and append it with the results.
+        start = 0
+        try:
+            for chunk in iter_chunks(input_path, chunk_rows, columns, sheet):
+                stop = start + len(chunk)
+                writer.write(assemble_result(chunk.reset_index(drop=True), {
+                    **{f"Allocate_{i}": np.asarray(allocations[i, start:stop]) for i in range(PASSES)},
+                    'rest_per': np.asarray(rest_per[start:stop]),
+                }, compact))
+                start = stop
+        finally:
+            writer.close()
+            del allocations, rest_per
+
+    return {'rows': n, 'partitions': len(partitions), 'chunk_rows': chunk_rows, 'partition_rows': partition_rows}
@@ -0,0 +1,176 @@
+"""
+Checks an input against a column mapping before it is allocated, so a bad
+file fails in well under a second instead of deep inside a run.
+
+validate() reports every problem at once: missing columns, CONT% or MC FIX
+values that are not numbers, infinite or too large to allocate, blank or
+negative numbers, blank keys and MC FIX values that differ within a (store,
+department, UDF) group. It also
+returns the input with CONT% and MC FIX coerced to numbers, which is what
+should be allocated.
+"""
+import numpy as np
+import pandas as pd
+
+from ficture_io import mapped_columns
+from ficture_processing import ALLOCATION_MAX, GroupIndex, combine_codes, key_codes, plain_value
+
+# Text read as a missing number.
+BLANK_TEXT = ('', 'nan', 'none', 'null', 'n/a', 'na', '-')
+
+# Row examples given per problem.
+MAX_EXAMPLES = 5
+
+class ValidationError(ValueError):
+    """Raised for an input with problems that prevent allocation; `problems` lists all of them."""
+
+    def __init__(self, problems):
+        self.problems = problems
+        super().__init__("; ".join(format_problem(problem) for problem in problems if problem['severity'] == 'error'))
+
+    def __reduce__(self):
+        # Rebuilt from the problems when it crosses a process boundary.
+        return (ValidationError, (self.problems,))
+
+def coerce_numeric(values):
+    """
+    Converts a column to float64 in bulk. Numbers pass through; text is
+    stripped, commas are dropped as thousands separators, a trailing '%'
+    divides by 100 ('12.5%' -> 0.125) and blank text becomes NaN.
+
+    Returns:
+        tuple: (float64 Series, boolean array of the values that are not
+        numbers and became NaN).
+    """
+    if pd.api.types.is_numeric_dtype(values) and not pd.api.types.is_bool_dtype(values):
+        return values.astype('float64'), np.zeros(len(values), dtype=bool)
+
+    # Text rules on every value in one pass: parsing the raw values first
+    # and only fixing up the failures is several times slower.
+    text = values.astype(str).str.strip()
+    percent = text.str.endswith('%').to_numpy(dtype=bool, na_value=False)
+    numbers = pd.to_numeric(
+        text.str.rstrip('%').str.replace(',', '', regex=False).str.strip(), errors='coerce'
+    ).astype('float64')
+    numbers[percent] /= 100
+    bad = (numbers.isna() & values.notna() & ~text.str.lower().isin(BLANK_TEXT)).to_numpy()
+    return numbers, bad
+
+def _problem(severity, check, column, message, rows=None, values=None):
+    """Builds a problem dict; `rows` are the affected row positions."""
+    examples = []
+    if rows is not None:
+        examples = [
+            (int(row), None if values is None else plain_value(values.iloc[row])) for row in rows[:MAX_EXAMPLES]
+        ]
+    return {
+        'severity': severity,
+        'check': check,
+        'column': column,
+        'rows': 0 if rows is None else int(len(rows)),
+        'examples': examples,
+        'message': message,
+    }
+
+def format_problem(problem):
+    """Formats a problem as one line, with its first example rows."""
+    text = problem['message']
+    if problem['examples']:
+        shown = ", ".join(
+            f"row {row + 1}" if value is None else f"row {row + 1} ({value!r})" for row, value in problem['examples']
+        )
+        more = " ..." if problem['rows'] > len(problem['examples']) else ""
+        text += f" (e.g. {shown}{more})"
+    return text
+
+def validate(df, col_map):
+    """
+    Checks `df` against `col_map` and coerces its CONT% and MC FIX columns
+    to numbers.
+
+    Args:
+        df (pd.DataFrame): The input DataFrame.
+        col_map (dict): A dictionary mapping generic column names to user-defined names.
+
+    Returns:
+        tuple: (df with CONT% and MC FIX as float64, or `df` itself when
+        columns are missing; list of problems). Each problem is a dict with
+        'severity' ('error' prevents the allocation, 'warning' does not),
+        'check', 'column', 'rows' (number of rows affected), 'examples'
+        ((row position, value) pairs) and 'message'.
+    """
+    problems = []
+    missing = [col for col in mapped_columns(col_map) if col not in df.columns]
+    if missing:
+        problems.append(_problem(
+            'error', 'missing_column', None, f"Columns not found in the file: {', '.join(map(str, missing))}"
+        ))
+        return df, problems
+
+    clean = df.copy(deep=False)
+    for key, label in (('cont_per', 'CONT%'), ('mc_fic', 'MC FIX')):
+        col = col_map[key]
+        values = df[col].reset_index(drop=True)
+        numbers, bad = coerce_numeric(values)
+        clean[col] = numbers.to_numpy()
+        if bad.any():
+            problems.append(_problem(
+                'error', 'not_numeric', col, f"{bad.sum():,} {label} values in '{col}' are not numbers",
+                np.flatnonzero(bad), values
+            ))
+        infinite = np.flatnonzero(np.isinf(numbers.to_numpy()))
+        if len(infinite):
+            problems.append(_problem(
+                'error', 'not_finite', col, f"{len(infinite):,} {label} values in '{col}' are infinite",
+                infinite, values
+            ))
+        blank = np.flatnonzero(numbers.isna().to_numpy() & ~bad)
+        if len(blank):
+            problems.append(_problem(
+                'warning', 'blank_number', col,
+                f"{len(blank):,} rows have no {label} in '{col}' and are not allocated", blank
+            ))
+        negative = np.flatnonzero((numbers < 0).to_numpy())
+        if len(negative):
+            problems.append(_problem(
+                'warning', 'negative', col, f"{len(negative):,} {label} values in '{col}' are negative",
+                negative, values
+            ))
+
+    # Allocations are held as int32, so MC FIX and the requirement must fit.
+    mc = clean[col_map['mc_fic']].to_numpy()
+    requirement = clean[col_map['cont_per']].to_numpy() * mc
+    too_large = np.flatnonzero(
+        np.isfinite(requirement) & ((np.abs(mc) > ALLOCATION_MAX) | (np.abs(requirement) > ALLOCATION_MAX))
+    )
+    if len(too_large):
+        problems.append(_problem(
+            'error', 'too_large', col_map['mc_fic'],
+            f"{len(too_large):,} rows have an MC FIX or CONT% × MC FIX above {ALLOCATION_MAX:,}, "
+            f"more fixtures than can be allocated", too_large
+        ))
+
+    keys = [col_map[key] for key in ('store', 'department', 'udf')]
+    codes = [key_codes(df[col]) for col in keys]
+    blank_key = np.flatnonzero(np.any([c < 0 for c in codes], axis=0)) if len(df) else np.zeros(0, dtype=np.int64)
+    if len(blank_key):
+        problems.append(_problem(
+            'warning', 'blank_key', None,
+            f"{len(blank_key):,} rows have no {' / '.join(map(str, keys))} value and are not allocated", blank_key
+        ))
+
+    # The allocation takes each group's MC FIX from its first row.
+    index = GroupIndex(combine_codes(combine_codes(codes[0], codes[1]), codes[2]))
+    rows = index.rows
+    expected = mc[index.first][index.codes[rows]]
+    differs = (mc[rows] != expected) & ~(np.isnan(mc[rows]) & np.isnan(expected))
+    if differs.any():
+        groups = len(np.unique(index.codes[rows[differs]]))
+        problems.append(_problem(
+            'warning', 'mc_fic_inconsistent', col_map['mc_fic'],
+            f"MC FIX differs within {groups:,} store/department/UDF groups ({differs.sum():,} rows); "
+            f"each group is allocated with the MC FIX of its first row",
+            np.sort(rows[differs]), df[col_map['mc_fic']].reset_index(drop=True)
+        ))
+
+    return clean, problems
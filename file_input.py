@@ -1,38 +1,347 @@
 import streamlit as st
-import pandas as pd
-import numpy as np
-from datetime import datetime as dt
+from datetime import datetime as dt, timedelta
+import importlib
 import os
 import time
-import altair as alt
 
-# Assuming ficture_processing.py and style.py are in the same directory
-from ficture_processing import ficture_allocation
+from ficture_jobs import JobManager, QueueFull
 from style import apply_styles
 
+class LazyModule:
+    """
+    Stands in for a module that is imported on the first access to one of
+    its attributes, so the upload page renders without loading pandas or the
+    allocation engine. importlib.import_module holds the import lock, which
+    keeps concurrent sessions from importing the module twice.
+    """
+
+    def __init__(self, name):
+        self._name = name
+
+    def __getattr__(self, attr):
+        return getattr(importlib.import_module(self._name), attr)
+
+ficture_cache = LazyModule('ficture_cache')
+ficture_filter = LazyModule('ficture_filter')
+ficture_io = LazyModule('ficture_io')
+ficture_processing = LazyModule('ficture_processing')
+ficture_validate = LazyModule('ficture_validate')
+
+# Filter option meaning "no filter"
+SHOW_ALL = 'Show All'
+
+# Upload formats; ficture_io.INPUT_FORMATS, spelled out so the upload page
+# does not import ficture_io (and pandas)
+UPLOAD_FORMATS = ['csv', 'xlsx', 'xls', 'parquet', 'feather']
+
+# Rows per page offered for the processed-data grid
+PAGE_SIZES = [50, 100, 500, 1000]
+
+# Formats offered for the processed-data download, with their labels
+DOWNLOAD_FORMATS = {'csv': 'CSV', 'parquet': 'Parquet', 'feather': 'Feather (Arrow)'}
+DOWNLOAD_COMPRESSIONS = {None: 'None', 'gzip': 'gzip', 'zip': 'zip'}
+
+# File name of the processed-data download, without the extensions
+DOWNLOAD_NAME = 'processed_ficture_allocation'
+
+# Intermediate columns left out of a download unless the audit columns are asked for
+AUDIT_PREFIXES = ('MC_BAl_', 'FIC_REQ_', 'rest_per')
+
+# Groups between checkpoints of a running allocation
+CHECKPOINT_GROUPS = 50_000
+
 st.set_page_config(page_title="Fixture Allocation App", layout="wide")
 
 # Apply the custom styles from the separate file
 apply_styles()
 
+def upload_hash(file):
+    """
+    Returns the content hash of an upload, computed once per session rather
+    than on every rerun.
+    """
+    hashes = st.session_state.setdefault('upload_hashes', {})
+    file_id = getattr(file, 'file_id', None)
+    if file_id not in hashes:
+        hashes[file_id] = ficture_cache.content_hash(file)
+    return hashes[file_id]
+
 @st.cache_data
-def load_data(file):
+def load_sheet_names(_file, file_hash, name):
     """
-    Loads data from an uploaded CSV or Excel file.
+    Returns the sheet names of an uploaded Excel file, or [] for other formats.
+    Cached by content hash and name; the upload itself is not hashed.
     """
     try:
-        if file.name.endswith('.csv'):
-            df = pd.read_csv(file)
-        elif file.name.endswith('.xlsx') or file.name.endswith('.xls'):
-            df = pd.read_excel(file)
-        else:
-            st.error("Unsupported file format. Please upload a CSV or Excel file.")
-            return None
-        return df
+        return ficture_io.sheet_names(_file, name=name)
+    except Exception as e:
+        st.error(f"Error reading workbook: {e}")
+        return []
+
+@st.cache_data
+def load_header(_file, file_hash, name, sheet=None):
+    """
+    Reads only the column names of an uploaded file. Cached by content hash,
+    name and sheet; the upload itself is not hashed.
+    """
+    if ficture_io.file_format(name) not in ficture_io.INPUT_FORMATS:
+        st.error("Unsupported file format. Please upload a CSV, Excel, Parquet or Feather file.")
+        return None
+    try:
+        return ficture_io.read_header(_file, name=name, sheet=sheet)
     except Exception as e:
         st.error(f"Error loading file: {e}")
         return None
 
+@st.cache_resource
+def get_ingest_store():
+    """
+    Returns the on-disk store of parsed uploads shared by all sessions.
+    """
+    return ficture_cache.IngestStore()
+
+@st.cache_resource(max_entries=2)
+def open_ingested(key):
+    """
+    Opens a stored upload once, memory-mapped, and shares the same DataFrame
+    with every session that asks for it. Callers must not modify it.
+    """
+    return get_ingest_store().open(key)
+
+def ingest(file, key, sheet=None, columns=None):
+    """
+    Parses an upload into the ingest store under `key` and returns None, or
+    returns the parsed DataFrame itself when the store cannot hold it (e.g. a
+    column with both numbers and text). That frame is kept in the session so
+    reruns do not parse the file again.
+    """
+    df = ficture_io.read_table(file, sheet=sheet, columns=columns)
+    # The store keeps column names as text; do the same for frames it cannot
+    # hold, so a header cell like 2024 is named '2024' either way
+    df.columns = df.columns.map(str)
+    if get_ingest_store().put(key, df):
+        return None
+    st.session_state['unstored_upload'] = (key, df)
+    return df
+
+def load_data(file, sheet=None, columns=None):
+    """
+    Loads data from an uploaded CSV, Excel, Parquet or Feather file,
+    optionally only the given columns, and reports the load time and the
+    size of the file.
+
+    An upload is parsed once into the ingest store; later loads of the same
+    content and options open that copy memory-mapped. Uploads the store
+    cannot hold are used as parsed.
+    """
+    try:
+        start = time.perf_counter()
+
+        store = get_ingest_store()
+        key = store.key(upload_hash(file), name=getattr(file, 'name', None), sheet=sheet, columns=columns)
+        unstored = st.session_state.get('unstored_upload')
+        if unstored is not None and unstored[0] == key:
+            df = unstored[1]
+        else:
+            df = ingest(file, key, sheet, columns) if key not in store else None
+            if df is None:
+                df = open_ingested(key)
+            if df is None:
+                # Evicted since it was stored; parse it again
+                open_ingested.clear()
+                df = ingest(file, key, sheet, columns)
+                if df is None:
+                    df = open_ingested(key)
+
+        stats = {'seconds': time.perf_counter() - start, 'bytes': ficture_io.input_size(file)}
+        return df, stats
+    except Exception as e:
+        st.error(f"Error loading file: {e}")
+        return None, None
+
+@st.cache_resource
+def get_result_cache():
+    """
+    Returns the on-disk allocation result cache shared by all sessions.
+    """
+    return ficture_cache.ResultCache()
+
+@st.cache_resource(max_entries=4)
+def load_cached_result(cache_key):
+    """
+    Reads a cached allocation result once and shares the same DataFrame with
+    every session that asks for it. Callers must not modify it.
+    """
+    return get_result_cache().get(cache_key)
+
+@st.cache_resource
+def get_job_manager():
+    """
+    Returns the background job pool shared by all sessions.
+    """
+    return JobManager()
+
+def run_allocation(df, col_map, cache_key, incremental, previous, workers, profile, progress):
+    """
+    Job body: allocates `df`, stores the result in the result cache and
+    returns everything the session needs to show it.
+
+    Serial runs are checkpointed under the cache key, so a run cut short by
+    a restart continues where it stopped when the same data is processed again.
+    The checkpoint of a cancelled or failed run is removed.
+    """
+    report = None
+    checkpoint = None
+    if workers == 1:
+        os.makedirs(ficture_cache.CHECKPOINT_DIR, exist_ok=True)
+        ficture_cache.evict_checkpoints()
+        checkpoint = ficture_processing.Checkpoint(
+            os.path.join(ficture_cache.CHECKPOINT_DIR, f"{cache_key}.npz"), CHECKPOINT_GROUPS
+        )
+    try:
+        if incremental:
+            result_df, state, report = ficture_processing.allocate_incremental(
+                df, col_map, previous=previous, workers=workers, progress=progress, profile=profile,
+                checkpoint=checkpoint
+            )
+        else:
+            result_df = ficture_processing.allocate(
+                df, col_map, workers=workers, progress=progress, profile=profile, checkpoint=checkpoint
+            )
+            state = previous
+    except Exception:
+        # Cancelled (JobCancelled) or failed: there is nothing to resume
+        if checkpoint is not None:
+            checkpoint.remove()
+        raise
+    get_result_cache().put(cache_key, result_df)
+    return {
+        'result_df': result_df,
+        'cube': ficture_processing.allocation_cube(result_df, col_map),
+        'allocation_state': state,
+        'report': report,
+        'profile': profile,
+        'resumed_from': checkpoint.resumed_from if checkpoint is not None else None,
+    }
+
+@st.fragment(run_every=1)
+def show_job():
+    """
+    Polls the session's allocation job: shows its progress with a cancel
+    button while it runs, and stores its result in the session when done.
+    """
+    manager = get_job_manager()
+    job = manager.get(st.session_state['job_id'])
+    if job is None:
+        del st.session_state['job_id']
+        st.rerun()
+
+    if job.active:
+        if job.status == 'queued':
+            st.write(f"⏳ Waiting for a free worker ({manager.queue_position(job.id)} jobs ahead)...")
+        elif job.progress is not None:
+            st.write(ficture_processing.format_progress(*job.progress))
+        else:
+            st.write("Starting...")
+        if st.button("✖️ Cancel"):
+            manager.cancel(job.id)
+        return
+
+    # The job finished: collect it and rerun the whole page to show the result
+    manager.pop(job.id)
+    del st.session_state['job_id']
+    if job.status == 'done':
+        result = job.result
+        st.session_state['processed_df'] = result['result_df']
+        st.session_state['cube'] = result['cube']
+        st.session_state['allocation_state'] = result['allocation_state']
+        st.session_state['profile'] = result['profile']
+        total_duration = timedelta(seconds=job.finished - job.started)
+        messages = [('write', f"🎉 Processing completed in: {total_duration}")]
+        if result['resumed_from'] is not None:
+            pass_no, group = result['resumed_from']
+            messages.append(('caption', f"Resumed from a checkpoint at pass {pass_no + 1}, group {group:,}."))
+        if result['report'] is not None:
+            report = result['report']
+            messages.append((
+                'caption',
+                f"Groups reused: {report['groups_reused']:,}, recomputed: {report['groups_recomputed']:,} "
+                f"({report['rows_recomputed']:,} rows)"
+            ))
+        st.session_state['job_messages'] = messages
+    elif job.status == 'cancelled':
+        st.session_state['job_messages'] = [('warning', "Processing was cancelled.")]
+    else:
+        st.session_state['job_messages'] = [('error', f"Processing failed: {job.error}")]
+    st.rerun()
+
+@st.cache_resource
+def get_export_store():
+    """
+    Returns the on-disk store of result exports shared by all sessions.
+    """
+    return ficture_cache.ExportStore()
+
+def export_download(result_df, exports, fmt, compression, audit):
+    """
+    Returns a callable for st.download_button that writes the export to the
+    export store when the button is clicked, and reuses that file for later
+    downloads of the same result and options until it is evicted.
+
+    `exports` is the session's export cache for `result_df`; the callable
+    runs outside the script run, so it must not use Streamlit itself.
+    """
+    store = get_export_store()
+
+    def build():
+        key = (fmt, compression, audit)
+        data = store.read(exports[key]) if key in exports else None
+        if data is None:
+            df = result_df if audit else result_df[[col for col in result_df.columns if not str(col).startswith(AUDIT_PREFIXES)]]
+            exports[key] = ficture_io.export_table(
+                df, store.new_path(fmt), fmt, compression, name=f"{DOWNLOAD_NAME}.{fmt}"
+            )
+            data = store.read(exports[key])
+            store.evict()
+        return data
+
+    return build
+
+def clear_exports(exports):
+    """Removes the exported files of an earlier result."""
+    store = get_export_store()
+    for path in exports.values():
+        store.remove(path)
+    exports.clear()
+
+def show_result_grid(result_df, filter_index, positions):
+    """
+    Shows one page of the selected result rows. Sorting, paging and column
+    selection happen on the server, so only the visible page is sent to the
+    browser.
+    """
+    n_rows = filter_index.n_rows if positions is None else len(positions)
+
+    # The intermediate MC_BAl_i / FIC_REQ_i columns are hidden by default
+    all_columns = list(result_df.columns)
+    default_columns = [col for col in all_columns if not str(col).startswith(('MC_BAl_', 'FIC_REQ_'))]
+
+    col1, col2, col3, col4 = st.columns([4, 2, 1, 1])
+    columns = col1.multiselect("Columns", all_columns, default=default_columns)
+    sort_by = col2.selectbox("Sort by", [None] + all_columns, format_func=lambda col: "(file order)" if col is None else col)
+    ascending = col3.radio("Order", ["Ascending", "Descending"], horizontal=False) == "Ascending"
+    page_size = col4.selectbox("Rows per page", PAGE_SIZES, index=1)
+
+    n_pages = max(1, -(-n_rows // page_size))
+    page = st.number_input(f"Page (of {n_pages:,})", min_value=1, max_value=n_pages, value=1) - 1
+
+    st.dataframe(filter_index.page(
+        result_df, positions, sort_by=sort_by, ascending=ascending,
+        page=page, page_size=page_size, columns=columns or None
+    ))
+    first = page * page_size
+    st.caption(f"Rows {min(first + 1, n_rows):,}–{min(first + page_size, n_rows):,} of {n_rows:,}")
+
 def main():
     """
     Main function for the Streamlit application UI.
@@ -40,17 +349,18 @@ def main():
     st.markdown("<h1>Fixture Allocation App</h1>", unsafe_allow_html=True)
     
     # --- UI for File Upload ---
-    uploaded_file = st.file_uploader("📥 Upload your CSV or Excel file", type=['csv', 'xlsx', 'xls'])
+    uploaded_file = st.file_uploader("📥 Upload your CSV, Excel, Parquet or Feather file", type=UPLOAD_FORMATS)
     
     if uploaded_file is not None:
-        df = load_data(uploaded_file)
-        if df is not None:
-            st.success("✅ File loaded successfully!")
-            
-            # Use st.expander for the preview to keep the UI clean
-            with st.expander("Preview of the Data"):
-                st.dataframe(df.head())
-            
+        # Workbooks with several sheets let the user pick one
+        file_hash = upload_hash(uploaded_file)
+        sheets = load_sheet_names(uploaded_file, file_hash, uploaded_file.name)
+        sheet = st.selectbox("Sheet", sheets) if len(sheets) > 1 else None
+
+        # Read the header first so only the needed columns are loaded
+        header = load_header(uploaded_file, file_hash, uploaded_file.name, sheet)
+        df = None
+        if header is not None:
             st.divider() # Add a divider for better visual separation
             
             # --- User input for column names ---
@@ -61,14 +371,7 @@ def main():
             with st.expander("Columns Mapping"):
                 # Use st.session_state to persist input values
                 if 'col_map' not in st.session_state:
-                    st.session_state['col_map'] = {
-                        'store': 'STORE',
-                        'department': 'DEPARTMENT',
-                        'udf': 'UDF-06',
-                        'mc_fic': 'MC FIX',
-                        'cont_per': 'CONT%',
-                        'art': 'ART'
-                    }
+                    st.session_state['col_map'] = dict(ficture_processing.DEFAULT_COL_MAP)
 
                 col1, col2 = st.columns(2)
                 with col1:
@@ -80,33 +383,120 @@ def main():
                     st.session_state['col_map']['cont_per'] = st.text_input("CONT% Column Name", value=st.session_state['col_map']['cont_per'])
                     st.session_state['col_map']['art'] = st.text_input("ART Column Name", value=st.session_state['col_map']['art'])
 
-            if st.button("🚀 Process Ficture Allocation"):
-                # Pass the column mapping to the processing function
-                st.session_state['cols'] = st.session_state['col_map']
-                
-                # The key change is here: creating the placeholder
-                status_placeholder = st.empty()
+                st.caption(f"Columns in file: {', '.join(map(str, header))}")
+
+            # Mapped columns missing from the file are reported by the validation below
+            col_map = st.session_state['col_map']
+            missing = [col for col in ficture_io.mapped_columns(col_map) if col not in header]
+
+            mapped_only = st.checkbox(
+                "Load only the mapped columns",
+                value=True,
+                help="Much faster for large files; the processed data then contains only these columns."
+            )
+
+            with st.spinner("Loading data..."):
+                df, stats = load_data(
+                    uploaded_file,
+                    sheet,
+                    ficture_io.mapped_columns(col_map) if mapped_only and not missing else None
+                )
+
+        if df is not None:
+            st.success(
+                f"✅ File loaded successfully! {len(df):,} rows × {len(df.columns)} columns "
+                f"in {stats['seconds']:.1f}s ({stats['bytes'] / 1e6:.1f} MB file)"
+            )
+            
+            # Use st.expander for the preview to keep the UI clean
+            with st.expander("Preview of the Data"):
+                st.dataframe(df.head())
+
+            # Check the data once per file and mapping; the numbers coerced by
+            # the check (e.g. "12.5%" -> 0.125) are what gets allocated
+            validation = st.session_state.get('validation')
+            if validation is None or validation[0] is not df or validation[1] != col_map:
+                validation = (df, dict(col_map), *ficture_validate.validate(df, col_map))
+                st.session_state['validation'] = validation
+            df, problems = validation[2], validation[3]
+            errors = [problem for problem in problems if problem['severity'] == 'error']
+            for problem in problems:
+                if problem['severity'] == 'error':
+                    st.error(ficture_validate.format_problem(problem))
+                else:
+                    st.warning(ficture_validate.format_problem(problem))
+
+            # Worker processes for the allocation; stores are split across them
+            workers = st.number_input(
+                "Worker Processes",
+                min_value=1,
+                max_value=os.cpu_count() or 1,
+                value=1,
+                help="Split stores across this many processes. The result is the same for any value."
+            )
+
+            # Reuse the groups that did not change since the previous run
+            incremental = st.checkbox(
+                "Recompute only changed groups",
+                value=True,
+                help="Store/department/UDF groups whose rows are unchanged since the last run in this session keep their earlier allocation."
+            )
+
+            # Time every phase of the run; a cached result is not reused then
+            profiling = st.checkbox(
+                "Profile the run",
+                value=False,
+                help="Record the time spent in each phase and pass, and the slowest store/department/UDF groups."
+            )
+
+            if st.button("🚀 Process Ficture Allocation", disabled='job_id' in st.session_state or bool(errors)):
+                # Pass a copy of the column mapping to the processing function
+                st.session_state['cols'] = dict(st.session_state['col_map'])
                 
+                # Reuse a result computed earlier for the same data and mapping
+                cache = get_result_cache()
+                cache_key = cache.key(df, st.session_state['cols'])
+
                 # Capture the start time
                 start_time = dt.now()
-                
-                # Pass the placeholder and the entire column mapping dictionary
-                result_df = ficture_allocation(
-                    df, 
-                    status_placeholder, 
-                    st.session_state['cols']
-                )
-                
-                # Capture the end time and calculate the total duration
-                end_time = dt.now()
-                total_duration = end_time - start_time
-                
-                # After the function completes, clear the placeholder and show the completion message
-                status_placeholder.empty()
-                st.write(f"🎉 Processing completed in: {total_duration}")
 
-                # Use session state to store the processed DataFrame and prevent re-running
-                st.session_state['processed_df'] = result_df
+                result_df = None
+                if cache_key in cache and not profiling:
+                    result_df = load_cached_result(cache_key)
+                    if result_df is None:
+                        # Evicted since the check; do not keep the miss, allocate again
+                        load_cached_result.clear()
+
+                if result_df is not None:
+                    total_duration = dt.now() - start_time
+                    st.session_state['job_messages'] = [('write', f"⚡ Loaded the cached result in: {total_duration}")]
+
+                    # Use session state to store the processed DataFrame and prevent re-running
+                    st.session_state['processed_df'] = result_df
+                    st.session_state['cube'] = ficture_processing.allocation_cube(result_df, st.session_state['cols'])
+                    st.session_state['profile'] = None
+                    # The incremental state belongs to the last computed run, not this result
+                    st.session_state.pop('allocation_state', None)
+                else:
+                    # Run the allocation in the background so the page stays responsive
+                    try:
+                        st.session_state['job_id'] = get_job_manager().submit(
+                            run_allocation,
+                            df,
+                            st.session_state['cols'],
+                            cache_key,
+                            incremental,
+                            st.session_state.get('allocation_state'),
+                            int(workers),
+                            ficture_processing.Profile() if profiling else None
+                        )
+                    except QueueFull as e:
+                        st.warning(str(e))
+
+            if 'job_id' in st.session_state:
+                show_job()
+            for kind, message in st.session_state.pop('job_messages', []):
+                getattr(st, kind)(message)
 
     # Display processed data and visualizations if available in session state
     if 'processed_df' in st.session_state:
@@ -115,43 +505,67 @@ def main():
         
         st.divider() # Add a divider for better visual separation
 
+        # Timings of the last run, when it was profiled
+        profile = st.session_state.get('profile')
+        if profile is not None:
+            with st.expander(f"⏱️ Profile ({profile.total_seconds:.2f}s)"):
+                st.markdown("**Phases**")
+                st.dataframe(profile.phases, hide_index=True)
+                st.markdown("**Slowest groups**")
+                st.dataframe(profile.hot_groups, hide_index=True)
+
         st.markdown("<h3>📊 Processed Data:</h3>", unsafe_allow_html=True)
 
+        # Index the filter columns once per result; reruns reuse it
+        indexed_df, filter_index = st.session_state.get('filter_index', (None, None))
+        if indexed_df is not result_df:
+            filter_index = ficture_filter.FilterIndex(result_df, {key: col_map[key] for key in ('store', 'department', 'udf')})
+            st.session_state['filter_index'] = (result_df, filter_index)
+
         # --- Filter section for processed data ---
         with st.expander("🔎 Filter Processed Data"):
-            # Get unique values for filters and add a "Show All" option
-            stores = ['Show All'] + sorted(list(result_df[col_map['store']].unique()))
-            departments = ['Show All'] + sorted(list(result_df[col_map['department']].unique()))
-            udfs = ['Show All'] + sorted(list(result_df[col_map['udf']].unique()))
+            # Offer each column's values, with missing ones shown as (blank)
+            def option_label(value):
+                return '(blank)' if value is None else str(value)
 
             col1, col2, col3 = st.columns(3)
-            selected_store = col1.selectbox("Filter by Store", stores)
-            selected_department = col2.selectbox("Filter by Department", departments)
-            selected_udf = col3.selectbox("Filter by UDF-06", udfs)
+            selections = {}
+            for column, key, label in [(col1, 'store', "Store"), (col2, 'department', "Department"), (col3, 'udf', "UDF-06")]:
+                selected = column.selectbox(
+                    f"Filter by {label}", [SHOW_ALL] + filter_index.options(key), format_func=option_label
+                )
+                if selected != SHOW_ALL:
+                    selections[key] = selected
         
         # Apply filters
-        filtered_df = result_df.copy()
-        if selected_store != 'Show All':
-            filtered_df = filtered_df[filtered_df[col_map['store']] == selected_store]
-        if selected_department != 'Show All':
-            filtered_df = filtered_df[filtered_df[col_map['department']] == selected_department]
-        if selected_udf != 'Show All':
-            filtered_df = filtered_df[filtered_df[col_map['udf']] == selected_udf]
-
-        st.dataframe(filtered_df)
+        positions = filter_index.select(selections)
+        show_result_grid(result_df, filter_index, positions)
 
         # --- Visualization section ---
         st.divider()
         st.markdown("<h3>📈 Visualizations</h3>", unsafe_allow_html=True)
 
+        # The charts read the per-group totals, never the row-level result
+        cube = st.session_state['cube']
+
         with st.expander("View Visualizations"):
+            # Altair is only needed once there is something to chart
+            import altair as alt
+            import pandas as pd
+
+            dimensions = {'store': "Store", 'department': "Department", 'udf': "UDF-06"}
+            dimension = st.radio(
+                "Break down by", list(dimensions), format_func=dimensions.get, horizontal=True
+            )
+            by = col_map[dimension]
+            breakdown = cube.groupby(by, dropna=False)[['Final', 'mc_fic', 'balance', 'requirement']].sum().reset_index()
+
             chart1, chart2 = st.columns(2)
 
-            # Chart 1: Total Final Allocation by Store
+            # Chart 1: Total Final Allocation by the chosen dimension
             with chart1:
-                st.subheader("Total Allocation by Store")
-                store_allocation = result_df.groupby(col_map['store'])['Final'].sum().reset_index()
-                st.bar_chart(store_allocation, x=col_map['store'], y='Final')
+                st.subheader(f"Total Allocation by {dimensions[dimension]}")
+                st.bar_chart(breakdown, x=by, y='Final')
             
             # Chart 2: Total Allocation by Pass
             with chart2:
@@ -159,9 +573,9 @@ def main():
                 pass_allocation = pd.DataFrame({
                     'Pass': ['Pass 1', 'Pass 2', 'Pass 3'],
                     'Allocation': [
-                        result_df['Allocate_0'].sum(),
-                        result_df['Allocate_1'].sum(),
-                        result_df['Allocate_2'].sum()
+                        cube['Allocate_0'].sum(),
+                        cube['Allocate_1'].sum(),
+                        cube['Allocate_2'].sum()
                     ]
                 })
 
@@ -176,13 +590,39 @@ def main():
 
                 st.altair_chart(chart, use_container_width=True)
 
+            # Fixtures available, allocated and left per value of the dimension
+            st.subheader(f"Fixture Balance by {dimensions[dimension]}")
+            st.dataframe(
+                breakdown.rename(columns={'mc_fic': 'Fixtures', 'Final': 'Allocated', 'balance': 'Left', 'requirement': 'Requirement'}),
+                hide_index=True
+            )
+
+        # Exports are written once per result and options, and only when downloaded
+        exported_df, exports = st.session_state.get('exports', (None, {}))
+        if exported_df is not result_df:
+            clear_exports(exports)
+            exports = {}
+            st.session_state['exports'] = (result_df, exports)
+
         # Provide download link for the processed data
-        csv = result_df.to_csv(index=False).encode('utf-8')
+        col1, col2, col3 = st.columns(3)
+        export_format = col1.selectbox(
+            "Download Format",
+            list(DOWNLOAD_FORMATS),
+            format_func=DOWNLOAD_FORMATS.get
+        )
+        compression = col2.selectbox("Compression", list(DOWNLOAD_COMPRESSIONS), format_func=DOWNLOAD_COMPRESSIONS.get)
+        audit = col3.checkbox(
+            "Include audit columns",
+            value=False,
+            help="Also export the rest_per and MC_BAl_i / FIC_REQ_i columns; otherwise the input columns, the per-pass allocations and Final."
+        )
         st.download_button(
-            label="📥 Download Processed Data as CSV",
-            data=csv,
-            file_name='processed_ficture_allocation.csv',
-            mime='text/csv',
+            label=f"📥 Download Processed Data as {DOWNLOAD_FORMATS[export_format]}",
+            data=export_download(result_df, exports, export_format, compression, audit),
+            file_name=f'{DOWNLOAD_NAME}.{export_format}{ficture_io.EXPORT_COMPRESSIONS[compression]}',
+            mime='application/gzip' if compression == 'gzip' else 'application/zip' if compression == 'zip' else ficture_io.MIME_TYPES[export_format],
+            on_click='ignore',
         )
 
 if __name__ == "__main__":
@@ -1,17 +1,16 @@
+import re
+
 import streamlit as st
 
-def apply_styles():
-    """
-    Applies custom CSS styles to the Streamlit application
-    with support for both light and dark themes, using
-    !important to override default Streamlit styles.
-    """
-    st.markdown("""
+# Poppins when it is installed locally, otherwise the system UI font. No web
+# font is fetched, so the first paint never waits on fonts.googleapis.com.
+FONT_STACK = "'Poppins', system-ui, -apple-system, 'Segoe UI', Roboto, 'Helvetica Neue', Arial, sans-serif"
+
+# The stylesheet, built and minified once per process.
+STYLES = re.sub(r'\s+', ' ', """
         <style>
-            @import url('https://fonts.googleapis.com/css2?family=Poppins:wght@400;600&display=swap');
-            
             html, body, [class*="st-"] {
-                font-family: 'Poppins', sans-serif;
+                font-family: FONT_STACK;
             }
 
             /* --- Light Theme Styles (Default) --- */
@@ -136,7 +135,18 @@ def apply_styles():
                 }
             }
         </style>
-    """, unsafe_allow_html=True)
+""".replace("FONT_STACK", FONT_STACK)).strip()
+
+def apply_styles():
+    """
+    Applies custom CSS styles to the Streamlit application
+    with support for both light and dark themes, using
+    !important to override default Streamlit styles.
+
+    Called on every script run: Streamlit removes elements a rerun does not
+    emit again, so styles sent only once per session would be dropped.
+    """
+    st.markdown(STYLES, unsafe_allow_html=True)
 
 
 
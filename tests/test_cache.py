@@ -0,0 +1,101 @@
+import os
+
+import pandas as pd
+import pytest
+
+import ficture_cache
+from ficture_processing import DEFAULT_COL_MAP
+
+def _frame(mc=5.0):
+    return pd.DataFrame({'STORE': ['S1', 'S2'], 'ART': [1, 2], 'MC FIX': [mc, 3.0]})
+
+def _write(path, size, mtime):
+    with open(path, 'wb') as f:
+        f.write(b'x' * size)
+    os.utime(path, (mtime, mtime))
+
+def test_key_changes_with_data_mapping_and_options(tmp_path):
+    cache = ficture_cache.ResultCache(str(tmp_path))
+    key = cache.key(_frame(), DEFAULT_COL_MAP)
+
+    assert cache.key(_frame(), dict(DEFAULT_COL_MAP)) == key
+    assert cache.key(_frame(mc=6.0), DEFAULT_COL_MAP) != key
+    assert cache.key(_frame(), dict(DEFAULT_COL_MAP, art='ARTICLE')) != key
+    assert cache.key(_frame(), DEFAULT_COL_MAP, compact=True) != key
+
+def test_key_changes_with_allocation_version(tmp_path, monkeypatch):
+    cache = ficture_cache.ResultCache(str(tmp_path))
+    key = cache.key(_frame(), DEFAULT_COL_MAP)
+    monkeypatch.setattr(ficture_cache, 'ALLOCATION_VERSION', ficture_cache.ALLOCATION_VERSION + 1)
+    assert cache.key(_frame(), DEFAULT_COL_MAP) != key
+
+def test_put_and_get(tmp_path):
+    cache = ficture_cache.ResultCache(str(tmp_path))
+    assert cache.get('missing') is None
+    assert cache.put('k', _frame())
+    assert 'k' in cache
+    pd.testing.assert_frame_equal(cache.get('k'), _frame())
+
+def test_put_skips_frames_arrow_cannot_store(tmp_path):
+    cache = ficture_cache.ResultCache(str(tmp_path))
+    df = pd.DataFrame({'ART': pd.Series([1, 'a'], dtype=object)})
+    assert not cache.put('k', df)
+    assert 'k' not in cache
+    assert not [name for name in os.listdir(tmp_path) if name.endswith('.tmp')]
+
+def test_evict_removes_least_recently_used_first(tmp_path):
+    for i, name in enumerate(('old', 'middle', 'new')):
+        _write(tmp_path / f"{name}.parquet", 100, 1_000_000 + i)
+    _write(tmp_path / 'other.txt', 1000, 0)
+
+    ficture_cache.ResultCache(str(tmp_path), max_bytes=250).evict()
+
+    assert sorted(os.listdir(tmp_path)) == ['middle.parquet', 'new.parquet', 'other.txt']
+
+def test_evict_skips_files_that_cannot_be_removed(tmp_path, monkeypatch):
+    _write(tmp_path / 'locked.arrow', 100, 1_000_000)
+    _write(tmp_path / 'old.arrow', 100, 1_000_001)
+    _write(tmp_path / 'new.arrow', 100, 1_000_002)
+    remove = os.remove
+
+    def locked(path):
+        if path.endswith('locked.arrow'):
+            raise PermissionError(path)
+        remove(path)
+
+    monkeypatch.setattr(os, 'remove', locked)
+    ficture_cache.IngestStore(str(tmp_path), max_bytes=250).evict()
+
+    assert sorted(os.listdir(tmp_path)) == ['locked.arrow', 'new.arrow']
+
+@pytest.mark.parametrize('store_class', [ficture_cache.ResultCache, ficture_cache.IngestStore])
+def test_put_succeeds_when_eviction_fails(tmp_path, monkeypatch, store_class):
+    store = store_class(str(tmp_path))
+
+    def fail():
+        raise PermissionError("in use")
+
+    monkeypatch.setattr(store, 'evict', fail)
+    assert store.put('k', _frame())
+    assert 'k' in store
+
+def test_ingest_store_round_trip(tmp_path):
+    store = ficture_cache.IngestStore(str(tmp_path))
+    key = store.key('abc', name='data.csv', sheet=None, columns=None)
+    assert key == store.key('abc', name='data.csv', sheet=None, columns=None)
+    assert key != store.key('abc', name='data.csv', sheet=None, columns=['ART'])
+    assert store.open(key) is None
+
+    assert store.put(key, _frame())
+    pd.testing.assert_frame_equal(store.open(key), _frame())
+
+def test_export_store_evicts_finished_exports_only(tmp_path):
+    store = ficture_cache.ExportStore(str(tmp_path), max_bytes=0)
+    _write(tmp_path / 'old.csv.gz', 100, 1_000_000)
+    _write(tmp_path / 'old.parquet', 100, 1_000_001)
+    _write(tmp_path / 'new.csv.abc123.tmp', 100, 1_000_002)
+    _write(tmp_path / 'notes.txt', 100, 1_000_003)
+
+    store.evict()
+
+    assert sorted(os.listdir(tmp_path)) == ['new.csv.abc123.tmp', 'notes.txt']
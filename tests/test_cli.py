@@ -0,0 +1,82 @@
+import os
+
+import pandas as pd
+import pytest
+
+import ficture_cli
+from benchmarks.datagen import generate
+from benchmarks.equivalence import compare
+from ficture_io import read_table
+from ficture_processing import DEFAULT_COL_MAP, allocate
+
+def _write_inputs(directory, names, seed=0):
+    """Writes one small generated input per name into `directory`; returns the frames by name."""
+    directory.mkdir(exist_ok=True)
+    frames = {}
+    for i, name in enumerate(names):
+        df = generate(200, stores=4, departments=2, udfs=2, articles_per_group=6, seed=seed + i)
+        df.to_csv(directory / name, index=False)
+        frames[name] = df
+    return frames
+
+def _run(*args):
+    return ficture_cli.main(['run', *map(str, args), '--jobs', '1'])
+
+def test_glob_expands_to_every_input(tmp_path):
+    frames = _write_inputs(tmp_path / 'in', ['a.csv', 'b.csv', 'notes.txt'])
+    out_dir = tmp_path / 'out'
+
+    assert _run(tmp_path / 'in' / '*.csv', '--out-dir', out_dir, '--format', 'parquet') == 0
+    assert sorted(os.listdir(out_dir)) == ['a_allocated.parquet', 'b_allocated.parquet']
+    for name in ('a', 'b'):
+        expected = allocate(frames[f"{name}.csv"], DEFAULT_COL_MAP)
+        assert compare(expected, read_table(str(out_dir / f"{name}_allocated.parquet"))) == {}
+
+def test_glob_matching_nothing(tmp_path, capsys):
+    assert _run(tmp_path / '*.csv', '--out-dir', tmp_path / 'out') == 2
+    assert 'No input files match' in capsys.readouterr().err
+    assert not (tmp_path / 'out').exists()
+
+def test_inputs_writing_the_same_output_are_refused(tmp_path, capsys):
+    _write_inputs(tmp_path / 'x', ['stores.csv'])
+    _write_inputs(tmp_path / 'y', ['stores.csv'])
+    out_dir = tmp_path / 'out'
+
+    assert _run(tmp_path / 'x' / 'stores.csv', tmp_path / 'y' / 'stores.csv', '--out-dir', out_dir) == 2
+    assert 'same output file' in capsys.readouterr().err
+    assert os.listdir(out_dir) == []
+
+def test_out_writes_the_format_of_its_extension(tmp_path):
+    frames = _write_inputs(tmp_path, ['stores.csv'])
+    out = tmp_path / 'result.feather'
+
+    assert _run(tmp_path / 'stores.csv', '--out', out) == 0
+    assert compare(allocate(frames['stores.csv'], DEFAULT_COL_MAP), read_table(str(out))) == {}
+
+@pytest.mark.parametrize('out, options', [('result.txt', []), ('result.xlsx', ['--stream'])])
+def test_out_with_unsupported_extension(tmp_path, capsys, out, options):
+    _write_inputs(tmp_path, ['stores.csv'])
+
+    assert _run(tmp_path / 'stores.csv', '--out', tmp_path / out, *options) == 2
+    assert 'Unsupported output format' in capsys.readouterr().err
+    assert os.listdir(tmp_path) == ['stores.csv']
+
+def test_out_with_several_inputs(tmp_path):
+    _write_inputs(tmp_path, ['a.csv', 'b.csv'])
+    assert _run(tmp_path / '*.csv', '--out', tmp_path / 'result.csv') == 2
+    assert not (tmp_path / 'result.csv').exists()
+
+def test_failed_file_sets_exit_status(tmp_path, capsys):
+    frames = _write_inputs(tmp_path / 'in', ['good.csv', 'bad.csv'])
+    bad = frames['bad.csv'].astype({'CONT%': object})
+    bad.loc[3, 'CONT%'] = 'n.a.x'
+    bad.to_csv(tmp_path / 'in' / 'bad.csv', index=False)
+    out_dir = tmp_path / 'out'
+
+    assert _run(tmp_path / 'in' / '*.csv', '--out-dir', out_dir) == 1
+    captured = capsys.readouterr()
+    assert 'bad.csv: FAILED' in captured.err
+    assert 'Processed 1 of 2 files' in captured.out
+    assert os.listdir(out_dir) == ['good_allocated.csv']
+    expected = allocate(frames['good.csv'], DEFAULT_COL_MAP)
+    assert compare(expected, pd.read_csv(out_dir / 'good_allocated.csv')) == {}
@@ -0,0 +1,55 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from ficture_filter import FilterIndex
+
+@pytest.fixture
+def result():
+    df = pd.DataFrame({
+        'STORE': ['S2', 'S1', None, 'S1', 'S2', 'S1', 'S3'],
+        'DEPARTMENT': ['D1', 'D2', 'D1', 'D1', 'D2', 'D1', 'D1'],
+        'Final': [3.0, 1.0, 5.0, np.nan, 2.0, 4.0, 0.0],
+    })
+    return df, FilterIndex(df, {'store': 'STORE', 'department': 'DEPARTMENT'})
+
+def test_options_and_positions(result):
+    df, index = result
+    assert index.options('store') == ['S1', 'S2', 'S3', None]
+    assert index.positions('store', 'S1').tolist() == [1, 3, 5]
+    assert index.positions('store', None).tolist() == [2]
+    assert index.positions('store', 'S9').tolist() == []
+
+def test_select(result):
+    df, index = result
+    assert index.select({}) is None
+    assert index.select({'store': 'S1', 'department': 'D1'}).tolist() == [3, 5]
+
+def test_mixed_types_are_indexed():
+    df = pd.DataFrame({'STORE': pd.Series([10, 'A', 10], dtype=object)})
+    index = FilterIndex(df, {'store': 'STORE'})
+    assert index.options('store') == [10, 'A']
+    assert index.positions('store', 10).tolist() == [0, 2]
+
+@pytest.mark.parametrize('page, expected', [(0, [0, 1, 2]), (2, [6]), (3, []), (10, [])])
+def test_page_bounds(result, page, expected):
+    df, index = result
+    assert index.page(df, page=page, page_size=3).index.tolist() == expected
+
+def test_page_of_selection(result):
+    df, index = result
+    positions = index.select({'store': 'S1'})
+    assert index.page(df, positions, page=0, page_size=2).index.tolist() == [1, 3]
+    assert index.page(df, positions, page=1, page_size=2).index.tolist() == [5]
+    assert index.page(df, positions, page=2, page_size=2).empty
+    assert index.page(df, np.zeros(0, dtype=np.int64), page=0).empty
+
+def test_page_sorted(result):
+    df, index = result
+    assert index.page(df, sort_by='Final', page_size=10).index.tolist() == [6, 1, 4, 0, 5, 2, 3]
+    assert index.page(df, sort_by='Final', ascending=False, page_size=10).index.tolist() == [2, 5, 0, 4, 1, 6, 3]
+
+    positions = index.select({'store': 'S1'})
+    page = index.page(df, positions, sort_by='Final', page=0, page_size=2, columns=['Final'])
+    assert page.index.tolist() == [1, 5]
+    assert list(page.columns) == ['Final']
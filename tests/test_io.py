@@ -0,0 +1,85 @@
+import gzip
+import io
+import os
+import zipfile
+
+import numpy as np
+import pandas as pd
+import pytest
+
+import ficture_io
+
+def _frame():
+    return pd.DataFrame({
+        'STORE': ['S1', 'S2', 'S3', 'S4', 'S5'],
+        'ART': pd.Series([1001, 'A-17', None, 1002, 'B'], dtype=object),
+        'Final': np.arange(5, dtype=np.float64),
+    })
+
+def _assert_read_back(path):
+    """Checks that a written _frame() reads back with ART as text."""
+    df = ficture_io.read_table(path)
+    assert [None if pd.isna(value) else value for value in df['ART']] == ['1001', 'A-17', None, '1002', 'B']
+    pd.testing.assert_frame_equal(df.drop(columns='ART'), _frame().drop(columns='ART'))
+
+@pytest.mark.parametrize('fmt', ['parquet', 'feather'])
+def test_export_mixed_type_columns(tmp_path, fmt):
+    df = _frame()
+    path = ficture_io.export_table(df, str(tmp_path / f"out.{fmt}"), fmt, chunk_rows=2)
+    _assert_read_back(path)
+    # The exported frame itself is left as it was
+    assert df['ART'].tolist()[:2] == [1001, 'A-17']
+
+@pytest.mark.parametrize('fmt', ['parquet', 'feather'])
+def test_write_mixed_type_columns(tmp_path, fmt):
+    path = str(tmp_path / f"out.{fmt}")
+    ficture_io.write_table(_frame(), path)
+    _assert_read_back(path)
+
+def test_export_csv_in_chunks(tmp_path):
+    path = ficture_io.export_table(_frame(), str(tmp_path / 'out.csv'), 'csv', chunk_rows=2)
+    df = pd.read_csv(path)
+    assert len(df) == 5
+    assert df['ART'].tolist()[:2] == ['1001', 'A-17']
+
+def test_export_empty_frame(tmp_path):
+    path = ficture_io.export_table(_frame().iloc[:0], str(tmp_path / 'out.parquet'), 'parquet')
+    assert list(ficture_io.read_table(path).columns) == ['STORE', 'ART', 'Final']
+
+def test_export_compressed(tmp_path):
+    gz = ficture_io.export_table(_frame(), str(tmp_path / 'a.csv'), 'csv', 'gzip')
+    assert gz.endswith('.csv.gz')
+    with gzip.open(gz) as f:
+        assert len(pd.read_csv(f)) == 5
+
+    zipped = ficture_io.export_table(_frame(), str(tmp_path / 'b.csv'), 'csv', 'zip', name='result.csv')
+    with zipfile.ZipFile(zipped) as archive:
+        assert archive.namelist() == ['result.csv']
+    assert not (tmp_path / 'b.csv').exists()
+
+def test_export_rejects_unknown_options(tmp_path):
+    with pytest.raises(ValueError):
+        ficture_io.export_table(_frame(), str(tmp_path / 'out.csv'), 'csv', 'rar')
+    with pytest.raises(ValueError):
+        ficture_io.export_table(_frame(), str(tmp_path / 'out.txt'), 'txt')
+
+def test_read_header_and_columns():
+    buffer = io.BytesIO(_frame().to_csv(index=False).encode('utf-8'))
+    assert ficture_io.read_header(buffer, name='data.csv') == ['STORE', 'ART', 'Final']
+    df = ficture_io.read_table(buffer, name='data.csv', columns=['STORE', 'Final'])
+    assert list(df.columns) == ['STORE', 'Final']
+
+@pytest.mark.parametrize('compression', [None, 'gzip', 'zip'])
+def test_export_leaves_only_the_finished_file(tmp_path, compression):
+    path = ficture_io.export_table(_frame(), str(tmp_path / 'out.parquet'), 'parquet', compression)
+    assert os.listdir(tmp_path) == [os.path.basename(path)]
+    assert path.endswith(ficture_io.EXPORT_SUFFIXES)
+
+def test_failed_export_leaves_no_files(tmp_path, monkeypatch):
+    def full_disk(source, dest):
+        raise OSError("No space left on device")
+
+    monkeypatch.setattr(ficture_io.shutil, 'copyfileobj', full_disk)
+    with pytest.raises(OSError):
+        ficture_io.export_table(_frame(), str(tmp_path / 'out.parquet'), 'parquet', 'gzip')
+    assert os.listdir(tmp_path) == []
@@ -0,0 +1,89 @@
+import threading
+import time
+
+import pytest
+
+from ficture_jobs import JobManager, QueueFull
+
+def _wait(job, timeout=5):
+    deadline = time.time() + timeout
+    while job.active and time.time() < deadline:
+        time.sleep(0.01)
+    assert not job.active
+
+def _blocking(release, started=None):
+    """A job function that reports progress until `release` is set."""
+    def run(progress):
+        if started is not None:
+            started.set()
+        while not release.wait(0.01):
+            progress(0, 0, 1, 0.0)
+        return 'released'
+    return run
+
+@pytest.fixture
+def manager():
+    manager = JobManager(max_workers=1, max_queued=2)
+    yield manager
+    manager._pool.shutdown(wait=False, cancel_futures=True)
+
+def test_result_and_progress(manager):
+    def run(value, progress):
+        progress(1, 2, 3, 0.5)
+        return value * 2
+
+    job = manager.get(manager.submit(run, 21))
+    _wait(job)
+    assert (job.status, job.result, job.progress) == ('done', 42, (1, 2, 3, 0.5))
+    assert manager.pop(job.id) is job
+    assert manager.get(job.id) is None
+
+def test_failure_is_recorded(manager):
+    def run(progress):
+        raise ValueError("bad input")
+
+    job = manager.get(manager.submit(run))
+    _wait(job)
+    assert job.status == 'failed'
+    assert isinstance(job.error, ValueError)
+
+def test_queue_full(manager):
+    release, started = threading.Event(), threading.Event()
+    running = manager.submit(_blocking(release, started))
+    started.wait(5)
+    queued = [manager.submit(_blocking(release)) for _ in range(2)]
+
+    with pytest.raises(QueueFull):
+        manager.submit(_blocking(release))
+    assert [manager.queue_position(job_id) for job_id in queued] == [0, 1]
+
+    release.set()
+    for job_id in [running] + queued:
+        _wait(manager.get(job_id))
+        assert manager.get(job_id).status == 'done'
+    manager.submit(_blocking(release))
+
+def test_cancel_running_job(manager):
+    release, started = threading.Event(), threading.Event()
+    job = manager.get(manager.submit(_blocking(release, started)))
+    started.wait(5)
+
+    manager.cancel(job.id)
+    _wait(job)
+    assert job.status == 'cancelled'
+    assert job.result is None
+    release.set()
+
+def test_cancel_queued_job(manager):
+    release, started = threading.Event(), threading.Event()
+    running = manager.get(manager.submit(_blocking(release, started)))
+    started.wait(5)
+    queued = manager.get(manager.submit(_blocking(release)))
+
+    manager.cancel(queued.id)
+    assert queued.status == 'cancelled'
+
+    release.set()
+    _wait(running)
+    assert running.status == 'done'
+    assert queued.status == 'cancelled'
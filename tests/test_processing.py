@@ -0,0 +1,255 @@
+import os
+
+import numpy as np
+import pandas as pd
+import pytest
+
+import ficture_processing
+from benchmarks.datagen import generate
+from benchmarks.equivalence import check
+from ficture_processing import (
+    DEFAULT_COL_MAP, Checkpoint, allocate, allocate_incremental, allocate_sweep, allocation_cube, resolve_rules,
+    resume_allocation, rule_grid
+)
+
+# Candidates that run in this process; the parallel one is checked once.
+IN_PROCESS = ['numpy', 'numpy-compact', 'incremental']
+
+def _frame(rows=400, **options):
+    return generate(rows, stores=6, departments=2, udfs=2, articles_per_group=8, **options)
+
+@pytest.mark.parametrize('cont, mc', [('lognormal', 'poisson'), ('coarse', 'small'), ('uniform', 'large')])
+@pytest.mark.parametrize('seed', [0, 1])
+def test_matches_reference(cont, mc, seed):
+    assert check(_frame(cont=cont, mc=mc, seed=seed), candidates=IN_PROCESS) == {}
+
+def test_matches_reference_with_cont_ties():
+    # Every CONT% tied within a group, and groups mixing tied and distinct values.
+    df = _frame(cont='coarse', mc='small', seed=2)
+    df.loc[df['STORE'] == df['STORE'].iloc[0], 'CONT%'] = 0.5
+    assert check(df, candidates=IN_PROCESS) == {}
+
+def test_matches_reference_with_missing_values():
+    df = _frame(cont='coarse', mc='small', missing=0.1, seed=3)
+    rng = np.random.default_rng(3)
+    for col in ('DEPARTMENT', 'UDF-06'):
+        df.loc[rng.random(len(df)) < 0.05, col] = None
+    assert check(df, candidates=IN_PROCESS) == {}
+
+@pytest.mark.parametrize('codes', ['int', 'float-with-nan', 'text-with-none'])
+def test_matches_reference_with_article_codes(codes):
+    df = _frame(cont='coarse', mc='poisson', seed=4)
+    numbers = df['ART'].str[1:].astype(int)
+    if codes == 'int':
+        df['ART'] = numbers
+    elif codes == 'float-with-nan':
+        df['ART'] = numbers.astype(float).where(np.arange(len(df)) % 7 != 0)
+    else:
+        df['ART'] = df['ART'].where(np.arange(len(df)) % 7 != 0, None)
+    assert check(df, candidates=IN_PROCESS) == {}
+
+def test_matches_reference_in_parallel():
+    assert check(_frame(seed=5), candidates=['numpy-parallel']) == {}
+
+def test_empty_input():
+    # The incremental candidate edits the first row, so it needs one.
+    assert check(_frame().iloc[:0], candidates=['numpy', 'numpy-compact']) == {}
+
+class _Stop(Exception):
+    pass
+
+def _stop_at(pass_no, groups_done):
+    """A progress callback that stops the run once it reaches group `groups_done` of pass `pass_no`."""
+    def progress(current_pass, done, total, elapsed):
+        if current_pass == pass_no and done >= groups_done:
+            raise _Stop()
+    return progress
+
+@pytest.fixture
+def small_blocks(monkeypatch):
+    # Many blocks, so runs can stop and snapshot within a pass.
+    monkeypatch.setattr(ficture_processing, 'BLOCK_ROWS', 16)
+
+@pytest.mark.parametrize('pass_no, groups_done', [(0, 5), (1, 0), (1, 9), (2, 12)])
+def test_checkpoint_resume_matches_uninterrupted_run(tmp_path, small_blocks, pass_no, groups_done):
+    df = _frame(cont='coarse', mc='small', missing=0.05, seed=6)
+    expected = allocate(df, DEFAULT_COL_MAP)
+    path = str(tmp_path / 'run.npz')
+
+    with pytest.raises(_Stop):
+        allocate(
+            df, DEFAULT_COL_MAP, checkpoint=Checkpoint(path, every_groups=2),
+            progress=_stop_at(pass_no, groups_done), progress_interval_ms=0
+        )
+    assert os.path.exists(path)
+
+    checkpoint = Checkpoint(path, every_groups=2, required=True)
+    result = allocate(df, DEFAULT_COL_MAP, checkpoint=checkpoint)
+    assert checkpoint.resumed_from is not None
+    assert checkpoint.resumed_from[0] == pass_no
+    pd.testing.assert_frame_equal(result, expected)
+    assert not os.path.exists(path)
+
+def test_resume_allocation(tmp_path, small_blocks):
+    df = _frame(seed=7)
+    path = str(tmp_path / 'run.npz')
+    with pytest.raises(_Stop):
+        allocate(df, DEFAULT_COL_MAP, checkpoint=Checkpoint(path), progress=_stop_at(1, 3), progress_interval_ms=0)
+
+    result = resume_allocation(df, DEFAULT_COL_MAP, path)
+    pd.testing.assert_frame_equal(result, allocate(df, DEFAULT_COL_MAP))
+    assert not os.path.exists(path)
+
+def test_resume_allocation_without_snapshot(tmp_path):
+    with pytest.raises(FileNotFoundError):
+        resume_allocation(_frame(), DEFAULT_COL_MAP, str(tmp_path / 'missing.npz'))
+
+@pytest.mark.parametrize('change', ['input', 'rules'])
+def test_resume_allocation_rejects_other_runs(tmp_path, small_blocks, change):
+    df = _frame(seed=8)
+    path = str(tmp_path / 'run.npz')
+    with pytest.raises(_Stop):
+        allocate(df, DEFAULT_COL_MAP, checkpoint=Checkpoint(path), progress=_stop_at(1, 3), progress_interval_ms=0)
+
+    rules = None
+    if change == 'input':
+        df = df.copy()
+        df.loc[0, 'CONT%'] = df.loc[0, 'CONT%'] + 1
+    else:
+        rules = {'min_requirement': 0.5}
+    with pytest.raises(ValueError):
+        resume_allocation(df, DEFAULT_COL_MAP, path, rules=rules)
+    assert os.path.exists(path)
+
+def test_checkpoint_of_other_run_is_not_resumed(tmp_path, small_blocks):
+    df = _frame(seed=9)
+    path = str(tmp_path / 'run.npz')
+    with pytest.raises(_Stop):
+        allocate(df, DEFAULT_COL_MAP, checkpoint=Checkpoint(path), progress=_stop_at(1, 3), progress_interval_ms=0)
+
+    checkpoint = Checkpoint(path)
+    rules = {'passes': 2}
+    result = allocate(df, DEFAULT_COL_MAP, checkpoint=checkpoint, rules=rules)
+    assert checkpoint.resumed_from is None
+    pd.testing.assert_frame_equal(result, allocate(df, DEFAULT_COL_MAP, rules=rules))
+    assert not os.path.exists(path)
+
+def test_incremental_recomputes_only_changed_groups():
+    df = _frame(seed=10)
+    first, state, report = allocate_incremental(df, DEFAULT_COL_MAP)
+    assert report['groups_reused'] == 0
+    pd.testing.assert_frame_equal(first, allocate(df, DEFAULT_COL_MAP))
+
+    changed = df.copy()
+    changed.loc[5, 'CONT%'] = changed.loc[5, 'CONT%'] + 0.3
+    result, _, report = allocate_incremental(changed, DEFAULT_COL_MAP, previous=state)
+    group = (changed[['STORE', 'DEPARTMENT', 'UDF-06']] == changed.loc[5, ['STORE', 'DEPARTMENT', 'UDF-06']]).all(axis=1)
+    assert report['groups_recomputed'] == 1
+    assert report['rows_recomputed'] == group.sum()
+    pd.testing.assert_frame_equal(result, allocate(changed, DEFAULT_COL_MAP))
+
+def test_incremental_recomputes_everything_when_rules_change():
+    df = _frame(seed=11)
+    _, state, report = allocate_incremental(df, DEFAULT_COL_MAP)
+    groups = report['groups_recomputed']
+
+    rules = {'min_rest_per': 0.2}
+    result, _, report = allocate_incremental(df, DEFAULT_COL_MAP, previous=state, rules=rules)
+    assert report == {'groups_reused': 0, 'groups_recomputed': groups, 'rows_recomputed': len(df)}
+    pd.testing.assert_frame_equal(result, allocate(df, DEFAULT_COL_MAP, rules=rules))
+
+@pytest.mark.parametrize('negative', [False, True])
+def test_allocation_cube_matches_the_rows(negative):
+    df = _frame(cont='coarse', mc='small', missing=0.05, seed=12)
+    if negative:
+        # Rows without an article start every pass from their own negative
+        # requirement, which pass 2 then allocates.
+        df['ART'] = df['ART'].str[1:].astype(float).where(df.index % 3 != 0)
+        df.loc[df.index % 5 == 0, 'CONT%'] *= -1
+        store = df['STORE'] == df['STORE'].iloc[0]
+        df.loc[store, 'MC FIX'] = -3.0
+        df.loc[store & (df.index % 2 == 0), 'CONT%'] = 1.5
+    result = allocate(df, DEFAULT_COL_MAP)
+    cube = allocation_cube(result, DEFAULT_COL_MAP)
+
+    keys = ['STORE', 'DEPARTMENT', 'UDF-06']
+    sums = result.groupby(keys)[[f"Allocate_{i}" for i in range(3)] + ['Final']].sum()
+    merged = cube.merge(sums, left_on=keys, right_index=True, suffixes=('', '_rows'))
+    assert len(merged) == len(cube) == len(sums)
+    for col in sums.columns:
+        np.testing.assert_array_equal(merged[col], merged[f"{col}_rows"])
+    assert cube['rows'].sum() == result[keys].notna().all(axis=1).sum()
+    if negative:
+        assert (result['Allocate_1'] < 0).any()
+
+    # The fixtures left per group are those the passes left.
+    swept = allocate_sweep(df, DEFAULT_COL_MAP, [{}]).iloc[0]
+    assert cube['balance'].sum() == pytest.approx(swept['balance'])
+    assert (cube['unmet_requirement'] >= 0).all()
+
+@pytest.fixture(params=['python', 'numba'])
+def kernel(request, monkeypatch):
+    if request.param == 'numba':
+        pytest.importorskip('numba')
+    monkeypatch.setattr(ficture_processing, 'KERNEL', request.param)
+    return request.param
+
+def test_kernels_agree(monkeypatch):
+    pytest.importorskip('numba')
+    df = _frame(cont='coarse', mc='small', missing=0.05, seed=13)
+    results = []
+    for name in ficture_processing.KERNELS:
+        monkeypatch.setattr(ficture_processing, 'KERNEL', name)
+        results.append(allocate(df, DEFAULT_COL_MAP))
+    pd.testing.assert_frame_equal(*results)
+
+@pytest.mark.parametrize('mc_fic', [np.inf, 5e9])
+def test_allocation_too_large_for_the_result_columns(kernel, mc_fic):
+    df = _frame(seed=14)
+    df.loc[df['STORE'] == df.loc[0, 'STORE'], 'MC FIX'] = mc_fic
+    with pytest.raises(OverflowError):
+        allocate(df, DEFAULT_COL_MAP)
+
+def test_format_progress():
+    assert ficture_processing.format_progress(1, 1200, 3400, 75) == (
+        "Processing Pass 2... 1,200 of 3,400 groups. Elapsed Time: 0:01:15"
+    )
+    assert ficture_processing.format_progress(None, 0, 6, 0).startswith("Processing stores... ")
+
+def test_resolve_rules():
+    assert resolve_rules() == ficture_processing.DEFAULT_RULES
+    assert resolve_rules({'passes': 2})['passes'] == 2
+
+@pytest.mark.parametrize('rules', [{'min_requirment': 0.3}, {'passes': 0}, {'passes': 4}, {'passes': 1.5}])
+def test_resolve_rules_rejects_bad_rules(rules):
+    with pytest.raises(ValueError):
+        resolve_rules(rules)
+
+@pytest.mark.parametrize('workers', [1, 2])
+def test_sweep_totals_match_allocate(workers):
+    df = _frame(cont='coarse', mc='small', missing=0.05, seed=15)
+    scenarios = rule_grid(passes=[1, 2, 3], min_requirement=[0.3, 0.6], min_rest_per=[0.0, 0.2])
+    sweep = allocate_sweep(df, DEFAULT_COL_MAP, scenarios, workers=workers)
+    assert len(sweep) == len(scenarios)
+
+    columns = [f"Allocate_{i}" for i in range(3)] + ['Final']
+    for rules, (_, row) in zip(scenarios, sweep.iterrows()):
+        assert {name: row[name] for name in rules} == rules
+        result = allocate(df, DEFAULT_COL_MAP, rules=rules)
+        assert row[columns].tolist() == result[columns].sum().tolist()
+        assert row['rows_allocated'] == (result['Final'] != 0).sum()
+
+def test_polars_backend_matches_numpy(monkeypatch):
+    pytest.importorskip('polars')
+    df = _frame(cont='coarse', mc='small', missing=0.05, seed=16)
+    expected = allocate(df, DEFAULT_COL_MAP)
+    monkeypatch.setattr(ficture_processing, 'BACKEND', 'polars')
+    pd.testing.assert_frame_equal(allocate(df, DEFAULT_COL_MAP), expected)
+
+def test_polars_backend_without_polars(monkeypatch):
+    find_spec = ficture_processing.importlib.util.find_spec
+    monkeypatch.setattr(ficture_processing.importlib.util, 'find_spec',
+                        lambda name, *args: None if name == 'polars' else find_spec(name, *args))
+    monkeypatch.setattr(ficture_processing, 'BACKEND', 'polars')
+    with pytest.raises(ImportError, match='pip install polars'):
+        allocate(_frame(), DEFAULT_COL_MAP)
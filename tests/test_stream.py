@@ -0,0 +1,71 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+import ficture_stream
+from benchmarks.datagen import generate
+from benchmarks.equivalence import compare
+from ficture_io import read_table
+from ficture_processing import DEFAULT_COL_MAP, allocate
+from ficture_stream import allocate_stream
+
+ROWS = 10_000
+
+@pytest.fixture(autouse=True)
+def small_probe(monkeypatch):
+    # With a 1 MB ceiling, this gives chunks and partitions of a few thousand rows.
+    monkeypatch.setattr(ficture_stream, 'PROBE_ROWS', 50)
+
+def _frame(seed=0):
+    return generate(ROWS, stores=30, departments=2, udfs=2, articles_per_group=10,
+                    cont='coarse', mc='small', missing=0.02, seed=seed)
+
+def _assert_split(report):
+    assert report['rows'] == ROWS
+    assert report['chunk_rows'] < ROWS
+    assert report['partitions'] > 1
+
+@pytest.mark.parametrize('output', ['parquet', 'csv', 'feather'])
+def test_parquet_input(tmp_path, output):
+    df = _frame()
+    source, target = tmp_path / 'input.parquet', tmp_path / f"output.{output}"
+    df.to_parquet(source, index=False)
+
+    report = allocate_stream(str(source), str(target), DEFAULT_COL_MAP, memory_mb=1)
+    _assert_split(report)
+    assert compare(allocate(df, DEFAULT_COL_MAP), read_table(str(target))) == {}
+
+def test_csv_keys_switching_between_numbers_and_text(tmp_path):
+    # Numeric store and article codes in the first chunks, text in the last.
+    df = _frame(seed=1)
+    for col, text in (('STORE', 'S-77'), ('ART', 'A-77')):
+        codes, _ = pd.factorize(df[col])
+        df[col] = pd.array(codes + 1001, dtype='Int64').astype(object)
+        df.loc[codes < 0, col] = None
+        df.loc[df.index[-100:], col] = text
+    source, target = tmp_path / 'input.csv', tmp_path / 'output.csv'
+    df.to_csv(source, index=False)
+
+    report = allocate_stream(str(source), str(target), DEFAULT_COL_MAP, memory_mb=1)
+    _assert_split(report)
+    # The types a full read gives the file are what the result must match.
+    expected = allocate(pd.read_csv(source), DEFAULT_COL_MAP)
+    assert compare(expected, pd.read_csv(target)) == {}
+
+def test_csv_numeric_keys_in_every_chunk(tmp_path):
+    df = _frame(seed=2)
+    df['STORE'] = pd.to_numeric(df['STORE'].str[1:]).astype('Int64')
+    df['ART'] = pd.to_numeric(df['ART'].str[1:])
+    source, target = tmp_path / 'input.csv', tmp_path / 'output.csv'
+    df.to_csv(source, index=False)
+
+    _assert_split(allocate_stream(str(source), str(target), DEFAULT_COL_MAP, memory_mb=1))
+    assert compare(allocate(pd.read_csv(source), DEFAULT_COL_MAP), pd.read_csv(target)) == {}
+
+def test_empty_input(tmp_path):
+    source, target = tmp_path / 'input.csv', tmp_path / 'output.csv'
+    _frame().iloc[:0].to_csv(source, index=False)
+    report = allocate_stream(str(source), str(target), DEFAULT_COL_MAP)
+    assert report['rows'] == 0
+    assert len(pd.read_csv(target)) == 0
+    assert np.isin(['Allocate_0', 'Final'], pd.read_csv(target).columns).all()
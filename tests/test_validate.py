@@ -0,0 +1,84 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from ficture_processing import DEFAULT_COL_MAP
+from ficture_validate import ValidationError, coerce_numeric, validate
+
+def _frame(**columns):
+    df = pd.DataFrame({
+        'STORE': ['S1', 'S1', 'S2'],
+        'DEPARTMENT': ['D1', 'D1', 'D1'],
+        'UDF-06': ['U1', 'U1', 'U1'],
+        'MC FIX': [4, 4, 2],
+        'CONT%': [0.5, 0.25, 1.0],
+        'ART': [1, 2, 3],
+    })
+    for col, values in columns.items():
+        df[col] = pd.Series(values, dtype=object)
+    return df
+
+def _checks(problems):
+    return {(problem['check'], problem['severity']) for problem in problems}
+
+def test_coerce_numeric_text():
+    values = pd.Series(['12.5%', ' 1,200 ', '', 'n/a', None, 'abc', 3], dtype=object)
+    numbers, bad = coerce_numeric(values)
+    np.testing.assert_allclose(numbers.to_numpy(), [0.125, 1200, np.nan, np.nan, np.nan, np.nan, 3])
+    assert bad.tolist() == [False, False, False, False, False, True, False]
+
+def test_coerce_numeric_passes_numbers_through():
+    numbers, bad = coerce_numeric(pd.Series([1, 2, 3]))
+    assert numbers.dtype == np.float64
+    assert not bad.any()
+
+def test_valid_input_has_no_problems():
+    clean, problems = validate(_frame(), DEFAULT_COL_MAP)
+    assert problems == []
+    assert clean['MC FIX'].dtype == np.float64
+
+def test_missing_columns_stop_the_checks():
+    df = _frame().drop(columns=['ART'])
+    clean, problems = validate(df, DEFAULT_COL_MAP)
+    assert clean is df
+    assert _checks(problems) == {('missing_column', 'error')}
+
+def test_mixed_numbers_and_text_are_coerced():
+    clean, problems = validate(_frame(**{'CONT%': ['50%', 0.25, 'x'], 'MC FIX': ['4', 4, None]}), DEFAULT_COL_MAP)
+    np.testing.assert_allclose(clean['CONT%'].to_numpy(), [0.5, 0.25, np.nan])
+    np.testing.assert_allclose(clean['MC FIX'].to_numpy(), [4, 4, np.nan])
+
+    assert _checks(problems) == {('not_numeric', 'error'), ('blank_number', 'warning')}
+    not_numeric = next(problem for problem in problems if problem['check'] == 'not_numeric')
+    assert not_numeric['column'] == 'CONT%'
+    assert not_numeric['examples'] == [(2, 'x')]
+
+def test_missing_and_mixed_keys():
+    df = _frame(STORE=['S1', np.nan, 7], DEPARTMENT=['D1', 'D1', None])
+    clean, problems = validate(df, DEFAULT_COL_MAP)
+    blank = next(problem for problem in problems if problem['check'] == 'blank_key')
+    assert blank['severity'] == 'warning'
+    assert blank['rows'] == 2
+    assert [row for row, _ in blank['examples']] == [1, 2]
+
+def test_mc_fic_differing_within_a_group():
+    clean, problems = validate(_frame(**{'MC FIX': [4, 5, 2]}), DEFAULT_COL_MAP)
+    assert _checks(problems) == {('mc_fic_inconsistent', 'warning')}
+    assert problems[0]['examples'] == [(1, 5)]
+
+def test_validation_error_lists_errors_only():
+    _, problems = validate(_frame(**{'CONT%': ['x', 0.25, 1.0], 'MC FIX': [4, -1, 2]}), DEFAULT_COL_MAP)
+    with pytest.raises(ValidationError) as info:
+        raise ValidationError(problems)
+    assert info.value.problems == problems
+    assert 'CONT%' in str(info.value)
+    assert 'negative' not in str(info.value)
+
+def test_infinite_and_too_large_numbers_are_errors():
+    _, problems = validate(_frame(**{'MC FIX': ['inf', 4, 2]}), DEFAULT_COL_MAP)
+    assert ('not_finite', 'error') in _checks(problems)
+
+    _, problems = validate(_frame(**{'MC FIX': [5e9, 5e9, 2]}), DEFAULT_COL_MAP)
+    assert ('too_large', 'error') in _checks(problems)
+    _, problems = validate(_frame(**{'CONT%': [0.5, 0.25, 3e9]}), DEFAULT_COL_MAP)
+    assert ('too_large', 'error') in _checks(problems)